@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from scripts.config import logger, BASE_DIR
+from scripts.benchmark.synthetic import generate
+from scripts.utils.metrics import by_stage, compare, load_history
+
+RESULTS_DIR = BASE_DIR / "benchmarks"
+
+# etapas medidas (nomes do histórico de métricas)
+STAGES = [
+    "etapa1.processamento",
+    "etapa1.consolidacao",
+    "etapa2.enriquecimento",
+    "etapa2.validacao",
+    "etapa2.agregacao",
+    "etapa2.transformacao",
+]
+
+# linhas por trimestre : operadoras
+DEFAULT_SCALES = ["10000:200", "100000:1000", "1000000:5000"]
+
+
+def parse_scale(text: str) -> Tuple[int, int]:
+    """"100000:1000" -> (100000 linhas por trimestre, 1000 operadoras)"""
+    rows, _, operadoras = text.partition(":")
+    rows = int(rows)
+    return rows, int(operadoras) if operadoras else max(1, min(1_000, rows // 20))
+
+
+def run_stages():
+    """
+    Executado no processo filho, com DATA_DIR/LOG_DIR apontando para a
+    pasta da escala: roda as etapas medidas sobre os dados sintéticos.
+    Cada função grava seu registro no histórico de métricas da pasta.
+    """
+    from scripts.etapa1.transform.processing import process
+    from scripts.etapa1.consolidate.consolidation import consolidate
+    from scripts.config import ETAPA2_CHUNK_ROWS
+    from scripts.etapa2.main import CONSOLIDADO, OPERADORAS_FILE
+    from scripts.etapa2.enrich import enriquecer_com_operadoras
+    from scripts.etapa2.validate import validar_dados
+    from scripts.etapa2.aggregate import agregar_despesas
+    from scripts.etapa2.streaming import transformar_em_blocos
+    from scripts.utils.registry import OperadoraRegistry
+    from scripts.utils.table_io import iter_dataset, read_dataset
+
+    process()
+    consolidate()
+
+    df_consolidado = read_dataset(CONSOLIDADO, columns=["RegistroANS", "Ano", "Trimestre", "ValorDespesas"])
+    registry = OperadoraRegistry.open(OPERADORAS_FILE)
+    df = enriquecer_com_operadoras(df_consolidado=df_consolidado, registry=registry)
+    df = validar_dados(df)
+    agregar_despesas(df)
+    del df, df_consolidado
+
+    # cadeia fundida do pipeline (blocos, sem intermediários)
+    colunas = ["RegistroANS", "Ano", "Trimestre", "ValorDespesas"]
+    transformar_em_blocos(iter_dataset(CONSOLIDADO, colunas, chunksize=ETAPA2_CHUNK_ROWS), registry)
+
+
+def _run_once(workspace: Path, run_id: str, env: Dict[str, str]) -> Dict[str, dict]:
+    # intermediários apagados: cada repetição parte do zero (sem cache de manifesto)
+    shutil.rmtree(workspace / "data" / "processed", ignore_errors=True)
+    child_env = {
+        **os.environ,
+        **env,
+        "DATA_DIR": str(workspace / "data"),
+        "LOG_DIR": str(workspace / "logs"),
+        "RUN_ID": run_id,
+        "PYTHONPATH": str(BASE_DIR),
+    }
+    subprocess.run(
+        [sys.executable, "-c", "from scripts.benchmark.run import run_stages; run_stages()"],
+        cwd=BASE_DIR, env=child_env, check=True
+    )
+    return by_stage(load_history(workspace / "logs" / "historico_execucoes.jsonl"), run_id)
+
+
+def _summary(samples: List[Dict[str, dict]]) -> Dict[str, dict]:
+    """Mediana de cada métrica entre as repetições (pico de RSS: máximo)"""
+    result = {}
+    for stage in STAGES:
+        records = [s[stage] for s in samples if stage in s]
+        if not records:
+            continue
+
+        def values(metric):
+            return [r[metric] for r in records if r.get(metric) is not None]
+
+        def median(metric):
+            return round(statistics.median(values(metric)), 4) if values(metric) else None
+
+        result[stage] = {
+            "tempo_s": median("tempo_s"),
+            "tempo_s_amostras": values("tempo_s"),
+            "cpu_s": median("cpu_s"),
+            "pico_rss_mb": max(values("pico_rss_mb"), default=None),
+            "pico_rss_filhos_mb": max(values("pico_rss_filhos_mb"), default=None),
+            "linhas_entrada": records[-1].get("linhas_entrada"),
+            "linhas_saida": records[-1].get("linhas_saida"),
+            "linhas_por_s": median("linhas_por_s"),
+        }
+    return result
+
+
+def git_version() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(
+    scales: Sequence[Tuple[int, int]],
+    trimestres: int = 4,
+    repeticoes: int = 3,
+    seed: int = 0,
+    env: Optional[Dict[str, str]] = None,
+    workdir: Optional[Path] = None,
+    manter: bool = False
+) -> dict:
+    """
+    Para cada escala (linhas por trimestre, operadoras): gera os dados
+    sintéticos numa pasta temporária e roda as etapas `repeticoes` vezes,
+    cada vez num processo novo. `env` repassa configurações ao processo
+    (ex: INTERMEDIATE_FORMAT, TRANSFORM_WORKERS).
+    """
+    env = dict(env or {})
+    stamp = f"{datetime.now():%Y%m%dT%H%M%S}"
+    results = []
+
+    for rows, operadoras in scales:
+        workspace = Path(tempfile.mkdtemp(prefix=f"bench_{rows}_", dir=workdir))
+        try:
+            logger.info(f"[benchmark] gerando {trimestres} trimestres x {rows} linhas, {operadoras} operadoras")
+            dados = generate(
+                workspace / "data" / "raw", rows, operadoras, trimestres, seed=seed,
+                cadop_path=workspace / "data" / "raw" / "operadoras_ativas.csv"
+            )
+            samples = []
+            for i in range(repeticoes):
+                logger.info(f"[benchmark] escala {rows}:{operadoras}, repetição {i + 1}/{repeticoes}")
+                samples.append(_run_once(workspace, f"bench-{stamp}-{rows}-{i}", env))
+        finally:
+            if not manter:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+        results.append({
+            "escala": f"{rows}:{operadoras}",
+            "linhas_por_trimestre": rows,
+            "trimestres": trimestres,
+            "linhas_total": rows * trimestres,
+            "operadoras": operadoras,
+            "tamanho_zips_mb": dados["tamanho_zips_mb"],
+            "etapas": _summary(samples),
+        })
+
+    return {
+        "versao": git_version(),
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": env,
+        },
+        "repeticoes": repeticoes,
+        "seed": seed,
+        "escalas": results,
+    }
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float, min_seconds: float) -> List[dict]:
+    """Compara dois resultados escala a escala, com as regras de metrics.compare"""
+    base = {s["escala"]: s["etapas"] for s in baseline["escalas"]}
+    rows = []
+    for scale in current["escalas"]:
+        if scale["escala"] not in base:
+            continue
+        for r in compare(scale["etapas"], base[scale["escala"]], tolerance, min_seconds):
+            rows.append({"escala": scale["escala"], **r})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com dados sintéticos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    run = sub.add_parser("executar", help="roda o benchmark e grava o resultado em JSON")
+    run.add_argument("--escalas", nargs="+", default=DEFAULT_SCALES, help="linhas_por_trimestre[:operadoras]")
+    run.add_argument("--trimestres", type=int, default=4)
+    run.add_argument("--repeticoes", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--env", nargs="*", default=[], metavar="VAR=VALOR", help="configuração repassada às etapas")
+    run.add_argument("--saida", type=Path, help=f"arquivo JSON (padrão: {RESULTS_DIR.name}/<versão>-<data>.json)")
+    run.add_argument("--pasta", type=Path, help="onde criar as pastas temporárias")
+    run.add_argument("--manter", action="store_true", help="não apaga os dados gerados")
+
+    cmp = sub.add_parser("comparar", help="compara dois resultados e aponta regressões")
+    cmp.add_argument("atual", type=Path)
+    cmp.add_argument("base", type=Path)
+    cmp.add_argument("--tolerancia", type=float, default=0.2)
+    cmp.add_argument("--minimo-s", type=float, default=1.0)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "executar":
+        env = dict(item.split("=", 1) for item in args.env)
+        result = benchmark(
+            [parse_scale(s) for s in args.escalas], args.trimestres, args.repeticoes,
+            args.seed, env, args.pasta, args.manter
+        )
+        output = args.saida or RESULTS_DIR / f"{result['versao'] or 'sem-versao'}-{datetime.now():%Y%m%dT%H%M%S}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        for scale in result["escalas"]:
+            for stage, m in scale["etapas"].items():
+                print(f"{scale['escala']:>15} {stage:<25} {m['tempo_s']:>9.3f}s {m['pico_rss_mb'] or 0:>9.1f} MB")
+        print(f"Resultado salvo em {output}")
+        return 0
+
+    current = json.loads(args.atual.read_text(encoding="utf-8"))
+    baseline = json.loads(args.base.read_text(encoding="utf-8"))
+    result = compare_results(current, baseline, args.tolerancia, args.minimo_s)
+    print(f"{current['versao']} vs base {baseline['versao']} (tolerância {args.tolerancia:.0%})")
+    for r in result:
+        flag = "REGRESSÃO" if r["regressao"] else ""
+        print(
+            f"{r['escala']:>15} {r['etapa']:<25} {r['metrica']:<14} {r['base']:>12} -> {r['atual']:>12} "
+            f"({r['variacao']:+.1%}) {flag}"
+        )
+    regressions = [r for r in result if r["regressao"]]
+    print(f"{len(regressions)} regressões encontradas")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
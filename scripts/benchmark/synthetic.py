@@ -0,0 +1,281 @@
+import argparse
+import csv
+import zipfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+# Gerador de dados sintéticos no formato da ANS: ZIPs trimestrais de
+# demonstrações contábeis e um Relatorio_cadop.csv coerente com eles.
+
+BLOCK_ROWS = 250_000
+
+DEMONSTRACOES_COLUMNS = [
+    "DATA", "REG_ANS", "CD_CONTA_CONTABIL", "DESCRICAO", "VL_SALDO_INICIAL", "VL_SALDO_FINAL"
+]
+
+CADOP_COLUMNS = [
+    "REGISTRO_OPERADORA", "CNPJ", "Razao_Social", "Nome_Fantasia", "Modalidade",
+    "Logradouro", "Numero", "Complemento", "Bairro", "Cidade", "UF", "CEP", "DDD",
+    "Telefone", "Fax", "Endereco_eletronico", "Representante", "Cargo_Representante",
+    "Regiao_de_Comercializacao", "Data_Registro_ANS"
+]
+
+# (código, descrição, peso): recorte do plano de contas; as contas de
+# EVENTOS/SINISTROS são as que o processamento seleciona
+PLANO_DE_CONTAS = [
+    ("1", "ATIVO", 3),
+    ("12", "ATIVO CIRCULANTE", 3),
+    ("1211", "CONTRAPRESTAÇÃO PECUNIÁRIA / PRÊMIO A RECEBER", 4),
+    ("2", "PASSIVO", 3),
+    ("21", "PASSIVO CIRCULANTE", 3),
+    ("2111", "PROVISÃO DE EVENTOS/SINISTROS A LIQUIDAR PARA OUTROS PRESTADORES", 4),
+    ("3", "CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE", 3),
+    ("31", "CONTRAPRESTAÇÕES LÍQUIDAS / PRÊMIOS RETIDOS", 4),
+    ("311", "Contraprestações Líquidas", 4),
+    ("4", "DESPESAS", 3),
+    ("41", "EVENTOS INDENIZÁVEIS LÍQUIDOS / SINISTROS RETIDOS", 4),
+    ("411", "EVENTOS/SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE MEDICO HOSPITALAR", 6),
+    ("4111", "EVENTOS/SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE MEDICO HOSPITALAR", 6),
+    ("41111", "Eventos/Sinistros Conhecidos ou Avisados - Consultas Médicas", 5),
+    ("41112", "Eventos/Sinistros Conhecidos ou Avisados - Internações", 5),
+    ("412", "EVENTOS/SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA ODONTOLÓGICA", 4),
+    ("43", "DESPESAS DE COMERCIALIZAÇÃO", 3),
+    ("46", "DESPESAS ADMINISTRATIVAS", 4),
+    ("461", "Despesas com Pessoal Próprio", 3),
+    ("47", "DESPESAS FINANCEIRAS", 2),
+]
+
+MODALIDADES = [
+    "Medicina de Grupo", "Cooperativa Médica", "Odontologia de Grupo", "Cooperativa Odontológica",
+    "Autogestão", "Seguradora Especializada em Saúde", "Filantropia", "Administradora de Benefícios",
+]
+
+UFS = [
+    "SP", "RJ", "MG", "RS", "PR", "SC", "BA", "PE", "CE", "GO", "DF", "ES", "PA", "MT",
+    "MS", "AM", "RN", "PB", "AL", "SE", "PI", "MA", "TO", "RO", "AC", "AP", "RR",
+]
+
+CIDADES = [
+    "SÃO PAULO", "RIO DE JANEIRO", "BELO HORIZONTE", "PORTO ALEGRE", "CURITIBA", "FLORIANÓPOLIS",
+    "SALVADOR", "RECIFE", "FORTALEZA", "GOIÂNIA", "BRASÍLIA", "VITÓRIA", "BELÉM", "CAMPINAS",
+]
+
+SILABAS = ["VI", "DA", "SA", "MED", "PRE", "VER", "BRA", "SUL", "NOR", "TE", "CAR", "LI", "ON", "GA"]
+TIPOS = ["ASSISTÊNCIA MÉDICA", "SAÚDE", "PLANOS DE SAÚDE", "ODONTO", "COOPERATIVA DE TRABALHO MÉDICO"]
+SUFIXOS = ["LTDA", "S.A.", "S/A", "LTDA."]
+
+CNPJ_PESOS_1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+CNPJ_PESOS_2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def quarter_names(inicio: int, quantidade: int) -> List[Tuple[str, int, int]]:
+    """`quantidade` trimestres a partir de 1T`inicio`: [("1T2023", 2023, 1), ...]"""
+    result = []
+    for i in range(quantidade):
+        ano, trimestre = inicio + i // 4, i % 4 + 1
+        result.append((f"{trimestre}T{ano}", ano, trimestre))
+    return result
+
+
+def registros(operadoras: int, seed: int = 0) -> np.ndarray:
+    """Registros ANS distintos (6 dígitos) das operadoras sintéticas"""
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(np.arange(300_000, 500_000), size=operadoras, replace=False))
+
+
+def cnpjs(n: int, rng: np.random.Generator) -> np.ndarray:
+    """CNPJs com dígitos verificadores válidos (14 dígitos, sem máscara)"""
+    base = rng.integers(0, 10, size=(n, 12))
+    base[:, 8:12] = [0, 0, 0, 1]  # matriz
+    d1 = (base @ CNPJ_PESOS_1) % 11
+    d1 = np.where(d1 < 2, 0, 11 - d1)
+    com_d1 = np.column_stack([base, d1])
+    d2 = (com_d1 @ CNPJ_PESOS_2) % 11
+    d2 = np.where(d2 < 2, 0, 11 - d2)
+    digits = np.column_stack([com_d1, d2]).astype(np.uint8) + ord("0")
+    return digits.view("S14").ravel().astype(str)
+
+
+def brl(cents: np.ndarray) -> pd.Series:
+    """Centavos -> texto com vírgula decimal e sem separador de milhar (ex: -1234,05)"""
+    sign = np.where(cents < 0, "-", "")
+    absolute = np.abs(cents)
+    reais = pd.Series(absolute // 100).astype(str)
+    centavos = pd.Series(absolute % 100).astype(str).str.zfill(2)
+    return sign + reais + "," + centavos
+
+
+def _block(
+    rng: np.random.Generator,
+    regs: np.ndarray,
+    rows: int,
+    data: str
+) -> pd.DataFrame:
+    pesos = np.array([p for _, _, p in PLANO_DE_CONTAS], dtype=float)
+    contas = rng.choice(len(PLANO_DE_CONTAS), size=rows, p=pesos / pesos.sum())
+    codigos = np.array([c for c, _, _ in PLANO_DE_CONTAS], dtype=object)
+    descricoes = np.array([d for _, d, _ in PLANO_DE_CONTAS], dtype=object)
+
+    # operadoras grandes concentram mais linhas (distribuição de Zipf truncada)
+    posicao = (rng.zipf(1.3, size=rows) - 1) % len(regs)
+
+    inicial = rng.lognormal(13, 2.5, size=rows).astype(np.int64)
+    variacao = (inicial * rng.normal(0.15, 0.4, size=rows)).astype(np.int64)
+    final = inicial + variacao
+    # saldos negativos e zerados aparecem nos dados reais
+    final[rng.random(rows) < 0.02] *= -1
+    inicial[rng.random(rows) < 0.03] = 0
+
+    return pd.DataFrame({
+        "DATA": data,
+        "REG_ANS": regs[posicao].astype(str),
+        "CD_CONTA_CONTABIL": codigos[contas],
+        "DESCRICAO": descricoes[contas],
+        "VL_SALDO_INICIAL": brl(inicial),
+        "VL_SALDO_FINAL": brl(final),
+    })
+
+
+def write_demonstracoes(
+    raw_dir: Path,
+    quarters: Sequence[Tuple[str, int, int]],
+    rows: int,
+    regs: np.ndarray,
+    seed: int = 0
+) -> List[Path]:
+    """
+    Um ZIP por trimestre (`1T2025.zip` com `1T2025.csv`), em latin1,
+    separado por ';', campos entre aspas e decimais com vírgula, como os
+    arquivos da ANS. As linhas são geradas e comprimidas em blocos, então
+    a memória não cresce com `rows`.
+    """
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, (name, ano, trimestre) in enumerate(quarters):
+        rng = np.random.default_rng([seed, i])
+        data = f"{ano}-{(trimestre - 1) * 3 + 1:02d}-01"
+        path = raw_dir / f"{name}.zip"
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+            with z.open(f"{name}.csv", "w", force_zip64=True) as member:
+                for start in range(0, rows, BLOCK_ROWS):
+                    block = _block(rng, regs, min(BLOCK_ROWS, rows - start), data)
+                    text = block.to_csv(
+                        None, sep=";", index=False, header=start == 0,
+                        quoting=csv.QUOTE_ALL, lineterminator="\n"
+                    )
+                    member.write(text.encode("latin1"))
+        paths.append(path)
+    return paths
+
+
+def _nomes(n: int, rng: np.random.Generator) -> np.ndarray:
+    s = np.array(SILABAS, dtype=object)
+    nomes = s[rng.integers(0, len(s), n)] + s[rng.integers(0, len(s), n)] + s[rng.integers(0, len(s), n)]
+    # índice no fim garante razões sociais distintas
+    return nomes + " " + np.arange(n).astype(str)
+
+
+def write_cadop(
+    path: Path,
+    regs: np.ndarray,
+    seed: int = 0,
+    ausentes: float = 0.03,
+    duplicadas: float = 0.01,
+    cnpj_invalido: float = 0.02,
+    incompletas: float = 0.02
+) -> Path:
+    """
+    Relatorio_cadop.csv (UTF-8, ';') das operadoras em `regs`, com as
+    imperfeições do cadastro real: operadoras ausentes, registros
+    duplicados, CNPJs inválidos e UF/Modalidade em branco (frações dadas).
+    """
+    rng = np.random.default_rng([seed, 1_000])
+    regs = regs[rng.random(len(regs)) >= ausentes]
+    n = len(regs)
+
+    nomes = _nomes(n, rng)
+    tipos = np.array(TIPOS, dtype=object)[rng.integers(0, len(TIPOS), n)]
+    sufixos = np.array(SUFIXOS, dtype=object)[rng.integers(0, len(SUFIXOS), n)]
+    cnpj = cnpjs(n, rng).astype(object)
+    invalidos = rng.random(n) < cnpj_invalido
+    cnpj[invalidos] = np.array([c[:-1] + str((int(c[-1]) + 1) % 10) for c in cnpj[invalidos]], dtype=object)
+
+    uf = np.array(UFS, dtype=object)[rng.integers(0, len(UFS), n)]
+    modalidade = np.array(MODALIDADES, dtype=object)[rng.integers(0, len(MODALIDADES), n)]
+    uf[rng.random(n) < incompletas] = ""
+    modalidade[rng.random(n) < incompletas] = ""
+
+    df = pd.DataFrame({
+        "REGISTRO_OPERADORA": regs.astype(str),
+        "CNPJ": cnpj,
+        "Razao_Social": nomes + " " + tipos + " " + sufixos,
+        "Nome_Fantasia": nomes + " " + tipos,
+        "Modalidade": modalidade,
+        "Logradouro": "RUA " + np.array(SILABAS, dtype=object)[rng.integers(0, len(SILABAS), n)],
+        "Numero": rng.integers(1, 5000, n).astype(str),
+        "Complemento": "",
+        "Bairro": "CENTRO",
+        "Cidade": np.array(CIDADES, dtype=object)[rng.integers(0, len(CIDADES), n)],
+        "UF": uf,
+        "CEP": rng.integers(1_000_000, 99_999_999, n).astype(str),
+        "DDD": rng.integers(11, 99, n).astype(str),
+        "Telefone": rng.integers(30_000_000, 39_999_999, n).astype(str),
+        "Fax": "",
+        "Endereco_eletronico": "contato@operadora" + np.arange(n).astype(str) + ".com.br",
+        "Representante": "REPRESENTANTE " + nomes,
+        "Cargo_Representante": "DIRETOR",
+        "Regiao_de_Comercializacao": rng.integers(1, 7, n).astype(str),
+        "Data_Registro_ANS": "2000-01-01",
+    }, columns=CADOP_COLUMNS)
+
+    # registro repetido com outro CNPJ (o enriquecimento mantém um só)
+    dup = df[rng.random(n) < duplicadas].copy()
+    dup["CNPJ"] = cnpjs(len(dup), rng)
+    df = pd.concat([df, dup], ignore_index=True)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, sep=";", index=False, quoting=csv.QUOTE_ALL, encoding="utf-8")
+    return path
+
+
+def generate(
+    raw_dir: Path,
+    rows: int,
+    operadoras: int,
+    trimestres: int = 4,
+    ano_inicial: int = 2024,
+    seed: int = 0,
+    cadop_path: Optional[Path] = None
+) -> dict:
+    """
+    Gera `trimestres` ZIPs com `rows` linhas cada e o cadastro das
+    `operadoras`. O cadastro vai para `cadop_path` (padrão:
+    raw_dir/Relatorio_cadop.csv). Mesma seed, mesmos arquivos.
+    """
+    regs = registros(operadoras, seed)
+    quarters = quarter_names(ano_inicial, trimestres)
+    zips = write_demonstracoes(raw_dir, quarters, rows, regs, seed)
+    cadop = write_cadop(cadop_path or raw_dir / "Relatorio_cadop.csv", regs, seed)
+    return {
+        "trimestres": [q for q, _, _ in quarters],
+        "linhas_por_trimestre": rows,
+        "operadoras": operadoras,
+        "zips": [str(p) for p in zips],
+        "tamanho_zips_mb": round(sum(p.stat().st_size for p in zips) / 1024 ** 2, 2),
+        "cadastro": str(cadop),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no formato da ANS")
+    parser.add_argument("destino", type=Path, help="pasta de saída (ex: data/raw)")
+    parser.add_argument("--linhas", type=int, default=100_000, help="linhas por trimestre")
+    parser.add_argument("--operadoras", type=int, default=1_000)
+    parser.add_argument("--trimestres", type=int, default=4)
+    parser.add_argument("--ano-inicial", type=int, default=2024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    info = generate(args.destino, args.linhas, args.operadoras, args.trimestres, args.ano_inicial, args.seed)
+    print(f"{len(info['zips'])} ZIPs ({info['tamanho_zips_mb']} MB) e cadastro em {info['cadastro']}")
@@ -11,11 +11,54 @@ if not BASE_URL:
 
 # PATHS
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+
+
+def _dir_from_env(name: str, default: str) -> Path:
+    # caminhos relativos são resolvidos a partir da raiz do projeto
+    path = Path(os.getenv(name, default))
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+DATA_DIR = _dir_from_env("DATA_DIR", "data")
 RAW_DIR = DATA_DIR / "raw"
 EXTRACT_DIR = DATA_DIR / "extracted"
 PROCESSED_DIR = DATA_DIR / "processed"
-LOG_DIR = BASE_DIR / "logs"
+LOG_DIR = _dir_from_env("LOG_DIR", "logs")
+
+# DOWNLOAD
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "5"))
+# espera antes da 2ª tentativa (dobra a cada falha)
+DOWNLOAD_BACKOFF_S = float(os.getenv("DOWNLOAD_BACKOFF_S", "1"))
+# true: process() lê CSV/TXT direto dos ZIPs em data/raw, sem gravar data/extracted
+STREAM_ZIP_MEMBERS = os.getenv("STREAM_ZIP_MEMBERS", "true").lower() in ("1", "true", "sim")
+
+# TRANSFORM
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", str(os.cpu_count() or 1)))
+# auto: usa pyarrow se instalado; pyarrow | pandas força o leitor
+CSV_ENGINE = os.getenv("CSV_ENGINE", "auto").lower()
+
+# INTERMEDIÁRIOS (csv | parquet | arrow)
+INTERMEDIATE_FORMAT = os.getenv("INTERMEDIATE_FORMAT", "csv").lower()
+
+# Reprocessa apenas trimestres novos/alterados (manifesto.json)
+INCREMENTAL = os.getenv("INCREMENTAL", "true").lower() in ("1", "true", "sim")
+
+# ZIP do consolidado: deflate | bzip2 | lzma | stored; nível 0-9
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "deflate").lower()
+ARCHIVE_LEVEL = int(os.getenv("ARCHIVE_LEVEL", "6"))
+
+# Motor da Etapa 2 (enriquecimento, validação e agregação): pandas | duckdb
+ETAPA2_ENGINE = os.getenv("ETAPA2_ENGINE", "pandas").lower()
+# grava consolidado_enriquecido/consolidado_validado (auditoria/depuração)
+ETAPA2_INTERMEDIARIOS = os.getenv("ETAPA2_INTERMEDIARIOS", "false").lower() in ("1", "true", "sim")
+# linhas do consolidado por bloco no motor pandas
+ETAPA2_CHUNK_ROWS = int(os.getenv("ETAPA2_CHUNK_ROWS", "500000"))
+# limite de memória do DuckDB (ex: "4GB"); vazio usa o padrão do DuckDB
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "")
+
+# PIPELINE: etapas independentes executadas ao mesmo tempo
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
 
 for d in [RAW_DIR, EXTRACT_DIR, PROCESSED_DIR, LOG_DIR]:
     d.mkdir(parents=True, exist_ok=True)
@@ -26,7 +69,7 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s",
     handlers=[
-        logging.FileHandler(LOG_FILE, mode="w", encoding="utf-8"),
+        logging.FileHandler(LOG_FILE, mode="a", encoding="utf-8"),
         logging.StreamHandler()
     ]
 )
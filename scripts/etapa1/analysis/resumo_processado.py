@@ -1,20 +1,40 @@
-import pandas as pd
-from scripts.config import logger, PROCESSED_DIR
+import json
+from scripts.config import logger
+from scripts.utils.metrics import instrumented
+from scripts.utils.table_io import read_dataset
+from scripts.etapa1.consolidate.consolidation import AUDIT
+from scripts.etapa1.manifest import CONSOLIDATED
 
-INPUT = PROCESSED_DIR / "consolidado_despesas.csv"
 
+def resumo_from_table() -> dict:
+    """Recalcula o resumo lendo o consolidado (quando a auditoria não existe)"""
+    df = read_dataset(CONSOLIDATED, columns=["RegistroANS", "Ano", "Trimestre", "ValorDespesas"])
+    return {
+        "linhas_consolidadas": len(df),
+        "operadoras_unicas": int(df["RegistroANS"].nunique()),
+        "anos_processados": sorted(df["Ano"].dropna().unique().tolist()),
+        "trimestres_processados": sorted(df["Trimestre"].dropna().unique().tolist()),
+        "valor_total": int(df["ValorDespesas"].sum()) / 100,
+    }
 
+
+@instrumented("etapa1.resumo")
 def resumo_processado():
     logger.info("Resumo final dos dados processados")
 
-    df = pd.read_csv(INPUT, sep=";", low_memory=False)
+    # a consolidação já grava estes números na auditoria
+    if AUDIT.exists():
+        with open(AUDIT, encoding="utf-8") as f:
+            resumo = json.load(f)
+    else:
+        resumo = resumo_from_table()
 
-    logger.info(f"Total de registros: {len(df):,}")
-    logger.info(f"Registros ANS únicos: {df['RegistroANS'].nunique():,}")
-    logger.info(f"Anos processados: {sorted(df['Ano'].unique().tolist())}")
+    logger.info(f"Total de registros: {resumo['linhas_consolidadas']:,}")
+    logger.info(f"Registros ANS únicos: {resumo['operadoras_unicas']:,}")
+    logger.info(f"Anos processados: {resumo['anos_processados']}")
     logger.info(
-        f"Trimestres processados: {sorted(df['Trimestre'].unique().tolist())}"
+        f"Trimestres processados: {resumo['trimestres_processados']}"
     )
     logger.info(
-        f"Valor total das despesas: {df['ValorDespesas'].sum():,.2f}"
+        f"Valor total das despesas: {resumo['valor_total']:,.2f}"
     )
@@ -1,68 +1,223 @@
-import pandas as pd
+import io
 import zipfile
 import json
-from scripts.config import logger, PROCESSED_DIR
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from scripts.config import logger, PROCESSED_DIR, ARCHIVE_CODEC, ARCHIVE_LEVEL, TRANSFORM_WORKERS
+from scripts.etapa1.manifest import Manifest, CONSOLIDATED, quarter_path
+from scripts.utils.metrics import instrumented
+from scripts.utils.schema import report_memory
+from scripts.utils.table_io import csv_text, iter_table, read_dataset, read_table, write_table
 
-INPUT = PROCESSED_DIR / "despesas_normalizadas.csv"
 OUTPUT = PROCESSED_DIR / "consolidado_despesas.csv"
+KEYS = ["RegistroANS", "Ano", "Trimestre"]
+COLUMNS = KEYS + ["ValorDespesas"]
+CHUNK_SIZE = 100_000
 ZIP_FILE = PROCESSED_DIR / "consolidado_despesas.zip"
 AUDIT = PROCESSED_DIR / "auditoria.json"
+ARCHIVE_CODECS = {
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+    "stored": zipfile.ZIP_STORED,
+}
+# níveis aceitos por codec (lzma e stored não usam nível)
+ARCHIVE_LEVELS = {
+    "deflate": range(0, 10),
+    "bzip2": range(1, 10),
+}
 
 
-def consolidate():
-    logger.info("Consolidação iniciada")
+def partial_sums(chunks: Iterable[pd.DataFrame]) -> Tuple[pd.Series, int, int]:
+    """
+    Soma ValorDespesas por (RegistroANS, Ano, Trimestre) bloco a bloco.
+    Cada bloco vira uma soma parcial que é mesclada no acumulador, então a
+    memória cresce com o número de chaves distintas, não com o de linhas.
+    """
+    acc: Optional[pd.Series] = None
+    linhas_lidas = 0
+    linhas_validas = 0
 
-    df = pd.read_csv(INPUT, sep=";", low_memory=False)
+    for chunk in chunks:
+        linhas_lidas += len(chunk)
 
-    # Garantir tipo numérico
-    df["ValorDespesas"] = pd.to_numeric(
-        df["ValorDespesas"],
-        errors="coerce"
-    )
+        # Manter apenas valores válidos
+        chunk = chunk[(chunk["ValorDespesas"] > 0).fillna(False)]
+        linhas_validas += len(chunk)
 
-    linhas_antes = len(df)
+        parcial = chunk.groupby(KEYS)["ValorDespesas"].sum()
+        acc = parcial if acc is None else acc.add(parcial, fill_value=0)
 
-    # Manter apenas valores válidos
-    df = df[df["ValorDespesas"] > 0]
+    if acc is None:
+        acc = pd.Series(
+            pd.array([], dtype="Int64"),
+            index=pd.MultiIndex.from_arrays([[], [], []], names=KEYS),
+            name="ValorDespesas"
+        )
 
-  
+    return acc.astype("Int64"), linhas_lidas, linhas_validas
 
 
-    # Consolidação
-    final = (
-        df.groupby(
-            ["RegistroANS", "Ano", "Trimestre"],
-            as_index=False
-        )
-        .agg({
-            "ValorDespesas": "sum"
-        })
-    )
+def consolidate_partition(source: Path, output: Path, chunksize: Optional[int] = CHUNK_SIZE) -> Tuple[int, int]:
+    """Consolida uma partição normalizada na partição equivalente do consolidado"""
+    if not source.exists():
+        chunks = []
+    elif chunksize:
+        chunks = iter_table(source, columns=COLUMNS, chunksize=chunksize)
+    else:
+        chunks = [read_table(source, columns=COLUMNS)]
 
-    final.to_csv(
-        OUTPUT,
-        index=False,
-        sep=";",
-        encoding="utf-8"
-    )
+    somas, lidas, validas = partial_sums(chunks)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    write_table(somas.reset_index(), output)
+    return lidas, validas
+
+
+def consolidate_partitions(
+    manifest: Manifest,
+    chunksize: Optional[int] = CHUNK_SIZE,
+    workers: int = TRANSFORM_WORKERS
+) -> Tuple[int, int]:
+    """
+    Como as chaves incluem ano e trimestre, cada partição é consolidada de
+    forma independente (em paralelo) e só quando foi reprocessada.
+    Retorna os totais de linhas lidas e válidas de todas as partições.
+    """
+    pending = []
+    for quarter in manifest.ordered():
+        entry = manifest.get(quarter)
+        cached = entry.get("consolidado")
+        output = quarter_path(CONSOLIDATED, quarter)
+        if not (cached and cached.get("sha256") == entry["sha256"] and output.exists()):
+            pending.append((quarter, manifest.path_of(quarter), output))
+
+    workers = min(workers, len(pending))
+    sources = [source for _, source, _ in pending]
+    outputs = [output for _, _, output in pending]
+    if workers > 1:
+        logger.info(f"Consolidando {len(pending)} partições com {workers} processos")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(consolidate_partition, sources, outputs, [chunksize] * len(pending)))
+    else:
+        results = [consolidate_partition(s, o, chunksize) for s, o in zip(sources, outputs)]
+
+    for (quarter, _, _), (lidas, validas) in zip(pending, results):
+        logger.info(f"Trimestre {quarter} consolidado")
+        entry = manifest.get(quarter)
+        entry["consolidado"] = {
+            "sha256": entry["sha256"],
+            "linhas_lidas": lidas,
+            "linhas_validas": validas,
+        }
+
+    manifest.save()
+    linhas_lidas = sum(manifest.get(q)["consolidado"]["linhas_lidas"] for q in manifest.quarters)
+    linhas_validas = sum(manifest.get(q)["consolidado"]["linhas_validas"] for q in manifest.quarters)
+    return linhas_lidas, linhas_validas
+
+
+class AuditStats:
+    """Estatísticas da auditoria acumuladas bloco a bloco durante a escrita"""
+
+    def __init__(self):
+        self.linhas = 0
+        self.total_centavos = 0
+        self.operadoras = set()
+        self.anos = set()
+        self.trimestres = set()
 
-    # Compactação
-    with zipfile.ZipFile(ZIP_FILE, "w", zipfile.ZIP_DEFLATED) as z:
-        z.write(OUTPUT, OUTPUT.name)
+    def update(self, chunk: pd.DataFrame):
+        self.linhas += len(chunk)
+        self.total_centavos += int(chunk["ValorDespesas"].sum())
+        self.operadoras.update(chunk["RegistroANS"].dropna().unique().tolist())
+        self.anos.update(chunk["Ano"].dropna().unique().tolist())
+        self.trimestres.update(chunk["Trimestre"].dropna().unique().tolist())
+
+    def to_dict(self) -> dict:
+        return {
+            "linhas_consolidadas": self.linhas,
+            "operadoras_unicas": len(self.operadoras),
+            "anos_processados": sorted(int(a) for a in self.anos),
+            "trimestres_processados": sorted(int(t) for t in self.trimestres),
+            "valor_total": self.total_centavos / 100,
+            "valor_medio": self.total_centavos / self.linhas / 100 if self.linhas else None,
+        }
+
+
+def archive_settings(codec: str = ARCHIVE_CODEC, level: int = ARCHIVE_LEVEL) -> Tuple[int, Optional[int]]:
+    """Codec e nível do ZIP validados, antes de qualquer arquivo ser gravado"""
+    if codec not in ARCHIVE_CODECS:
+        raise ValueError(f"ARCHIVE_CODEC desconhecido: {codec}")
+    levels = ARCHIVE_LEVELS.get(codec)
+    if levels is None:
+        return ARCHIVE_CODECS[codec], None
+    if level not in levels:
+        raise ValueError(f"ARCHIVE_LEVEL {level} inválido para {codec} (aceito: {levels.start} a {levels.stop - 1})")
+    return ARCHIVE_CODECS[codec], level
+
+
+def write_outputs(final: pd.DataFrame, chunksize: int) -> dict:
+    """
+    Uma única passada sobre `final` grava o CSV, o membro do ZIP (com o
+    codec/nível de ARCHIVE_CODEC/ARCHIVE_LEVEL) e acumula as estatísticas
+    da auditoria.
+    """
+    stats = AuditStats()
+    codec, level = archive_settings()
+
+    with open(OUTPUT, "w", encoding="utf-8", newline="") as csv_file, \
+            zipfile.ZipFile(ZIP_FILE, "w", codec, compresslevel=level) as z, \
+            z.open(OUTPUT.name, "w", force_zip64=True) as member:
+        archive = io.TextIOWrapper(member, encoding="utf-8", newline="")
+
+        for start in range(0, max(len(final), 1), chunksize):
+            chunk = final.iloc[start:start + chunksize]
+            text = csv_text(chunk, header=start == 0)
+            csv_file.write(text)
+            archive.write(text)
+            stats.update(chunk)
+
+        archive.flush()
+        archive.detach()
+
+    return stats.to_dict()
+
+
+@instrumented(
+    "etapa1.consolidacao",
+    rows=lambda audit, *a, **kw: (audit["linhas_lidas"], audit["linhas_consolidadas"])
+)
+def consolidate(chunksize: Optional[int] = CHUNK_SIZE, workers: int = TRANSFORM_WORKERS):
+    logger.info("Consolidação iniciada")
+    archive_settings()  # configuração do ZIP inválida falha antes de consolidar
+
+    manifest = Manifest()
+    if not manifest.quarters:
+        logger.warning("Nenhum trimestre no manifesto: execute o processamento antes")
+
+    # Valores em centavos inteiros: a soma sai exata
+    linhas_antes, linhas_validas = consolidate_partitions(manifest, chunksize, workers)
+
+    # Consolidação: junta as somas das partições (já pequenas)
+    final = (
+        read_dataset(CONSOLIDATED, columns=COLUMNS)
+        .groupby(KEYS)["ValorDespesas"].sum()
+        .astype("Int64")
+        .reset_index()
+    )
+    report_memory("etapa1.consolidacao", final)
 
-    # Auditoria
+    # CSV, ZIP e auditoria numa única passada
     audit = {
         "linhas_lidas": int(linhas_antes),
-        "linhas_validas": int(len(df)),
-        "linhas_consolidadas": int(len(final)),
-        "operadoras_unicas": int(final["RegistroANS"].nunique()),
-        "anos_processados": sorted(final["Ano"].dropna().unique().tolist()),
-        "trimestres_processados": sorted(final["Trimestre"].dropna().unique().tolist()),
-        "valor_total": float(final["ValorDespesas"].sum()),
-        "valor_medio": float(final["ValorDespesas"].mean())
+        "linhas_validas": int(linhas_validas),
+        **write_outputs(final, chunksize or len(final) or 1),
     }
 
     with open(AUDIT, "w", encoding="utf-8") as f:
         json.dump(audit, f, indent=2, ensure_ascii=False)
 
     logger.info(" Consolidação concluída com sucesso")
+    return audit
@@ -0,0 +1,131 @@
+import json
+import re
+import threading
+import requests
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+from scripts.config import logger, RAW_DIR, DOWNLOAD_WORKERS
+
+CACHE_FILE = RAW_DIR / "listagens_cache.json"
+TIMEOUT = 10
+QUARTER_RE = re.compile(r"([1-4])T(\d{4})", re.IGNORECASE)
+
+
+class ListingCache:
+    """
+    Cache local das páginas de listagem da ANS.
+    Cada URL guarda o HTML junto com ETag/Last-Modified para revalidação
+    condicional: um 304 reaproveita o corpo salvo sem baixar de novo.
+    """
+
+    def __init__(self, path: Path = CACHE_FILE, session: Optional[requests.Session] = None):
+        self.path = path
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            self._entries: Dict[str, dict] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, url: str) -> str:
+        with self._lock:
+            entry = self._entries.get(url)
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        r = self.session.get(url, headers=headers, timeout=TIMEOUT)
+        if r.status_code == 304 and entry:
+            return entry["body"]
+        r.raise_for_status()
+
+        with self._lock:
+            self._entries[url] = {
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "body": r.text,
+            }
+            self._dirty = True
+        return r.text
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self._entries, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path)
+            self._dirty = False
+
+
+def list_links(html: str) -> List[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    return [a["href"] for a in soup.find_all("a", href=True)]
+
+
+def list_years(cache: ListingCache, url: str) -> List[int]:
+    return sorted(
+        {int(h.strip("/")) for h in list_links(cache.get(url)) if h.strip("/").isdigit()},
+        reverse=True
+    )
+
+
+def list_quarter_zips(cache: ListingCache, y_url: str) -> List[Tuple[int, int, str, str]]:
+    """Retorna (ano, trimestre, nome, url) dos ZIPs trimestrais de uma pasta de ano"""
+    zips = []
+    for href in list_links(cache.get(y_url)):
+        if not (href.endswith(".zip") and href[0].isdigit()):
+            continue
+        m = QUARTER_RE.search(href)
+        ano, trimestre = (int(m.group(2)), int(m.group(1))) if m else (0, 0)
+        zips.append((ano, trimestre, href, f"{y_url}{href}"))
+    return zips
+
+
+def crawl_quarters(
+    url: str,
+    limit: Optional[int] = 3,
+    cache: Optional[ListingCache] = None,
+    workers: int = DOWNLOAD_WORKERS,
+    anos: Optional[Tuple[int, int]] = None
+) -> List[Tuple[str, str]]:
+    """
+    Percorre as pastas de ano da mais recente para a mais antiga e para
+    assim que `limit` trimestres forem encontrados. Quando um lote precisa
+    de mais de um ano, as páginas são buscadas em paralelo.
+    `anos=(inicio, fim)` restringe às pastas dessa faixa (backfill).
+    """
+    cache = cache or ListingCache()
+    years = list_years(cache, url)
+    if anos is not None:
+        years = [y for y in years if anos[0] <= y <= anos[1]]
+    found: List[Tuple[int, int, str, str]] = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        i = 0
+        while i < len(years) and (limit is None or len(found) < limit):
+            # cada ano tem no máximo 4 trimestres
+            if limit is None:
+                batch_size = max(1, workers)
+            else:
+                batch_size = max(1, min(workers, -(-(limit - len(found)) // 4)))
+            batch = years[i:i + batch_size]
+            i += batch_size
+
+            y_urls = [f"{url.rstrip('/')}/{year}/" for year in batch]
+            for zips in pool.map(lambda u: list_quarter_zips(cache, u), y_urls):
+                found.extend(sorted(zips, reverse=True))
+
+    cache.save()
+    logger.info(f"Listagem concluída: {len(found)} trimestres em {min(i, len(years))} pastas de ano")
+
+    selected = found if limit is None else found[:limit]
+    return [(name, zip_url) for _, _, name, zip_url in selected]
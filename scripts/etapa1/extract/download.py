@@ -1,74 +1,76 @@
+import shutil
 import zipfile
-import requests
-import re
-from bs4 import BeautifulSoup
-from typing import List, Tuple
-from scripts.config import logger, BASE_URL, RAW_DIR, EXTRACT_DIR
-
-def find_demonstracoes_url() -> str:
-    r = requests.get(BASE_URL, timeout=10)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
-    for a in soup.find_all("a", href=True):
-        if "demonstra" in a["href"].lower():
-            return BASE_URL.rstrip("/") + "/" + a["href"].lstrip("/")
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from scripts.config import logger, BASE_URL, RAW_DIR, EXTRACT_DIR, STREAM_ZIP_MEMBERS
+from scripts.etapa1.extract.crawler import ListingCache, crawl_quarters, list_links
+from scripts.etapa1.extract.downloader import download_all, CHUNK_SIZE
+from scripts.utils.metrics import instrumented
+
+def find_demonstracoes_url(cache: Optional[ListingCache] = None) -> str:
+    cache = cache or ListingCache()
+    for href in list_links(cache.get(BASE_URL)):
+        if "demonstra" in href.lower():
+            return BASE_URL.rstrip("/") + "/" + href.lstrip("/")
     raise RuntimeError("Pasta demonstrações não encontrada")
 
-def get_last_trimesters(url: str, limit=3) -> List[Tuple[str, str]]:
-    files = []
-    soup = BeautifulSoup(requests.get(url).text, "html.parser")
-    years = sorted(
-        [int(a["href"].strip("/")) for a in soup.find_all("a", href=True) if a["href"].strip("/").isdigit()],
-        reverse=True
-    )
-    for year in years:
-        y_url = f"{url.rstrip('/')}/{year}/"
-        s = BeautifulSoup(requests.get(y_url).text, "html.parser")
-        for a in s.find_all("a", href=True):
-            if a["href"].endswith(".zip") and a["href"][0].isdigit():
-                files.append((a["href"], f"{y_url}{a['href']}"))
-    return files[:limit]
-
-def download_and_extract():
+def get_last_trimesters(url: str, limit=3, cache: Optional[ListingCache] = None) -> List[Tuple[str, str]]:
+    return crawl_quarters(url, limit=limit, cache=cache)
+
+def get_trimesters_between(url: str, inicio: int, fim: int, cache: Optional[ListingCache] = None) -> List[Tuple[str, str]]:
+    """Todos os trimestres publicados entre os anos `inicio` e `fim` (inclusive)"""
+    return crawl_quarters(url, limit=None, cache=cache, anos=(inicio, fim))
+
+def iter_members(z: zipfile.ZipFile, trimestre: str) -> Iterator[Tuple[str, str]]:
+    """Membros do ZIP com o nome lógico usado na extração (ex: 1T2025.csv, 1T2025_2.csv)"""
+    count = 0
+    for member in z.namelist():
+        if member.endswith("/"):
+            continue
+
+        count += 1
+        ext = member.split(".")[-1]
+        suffix = f"_{count}" if count > 1 else ""
+        yield member, f"{trimestre}{suffix}.{ext}"
+
+@instrumented("etapa1.download", rows=lambda paths, *a, **kw: (None, len(paths)))
+def download_and_extract(anos: Optional[Tuple[int, int]] = None) -> List[Path]:
+    """Baixa os 3 últimos trimestres ou, com `anos=(inicio, fim)`, todos os da faixa"""
     logger.info("Download e extração iniciados")
 
-    base = find_demonstracoes_url()
-    files = get_last_trimesters(base)
+    cache = ListingCache()
+    base = find_demonstracoes_url(cache)
+    if anos is None:
+        files = get_last_trimesters(base, cache=cache)
+    else:
+        logger.info(f"Backfill dos anos {anos[0]} a {anos[1]}")
+        files = get_trimesters_between(base, *anos, cache=cache)
 
     EXTRACT_DIR.mkdir(parents=True, exist_ok=True)
     RAW_DIR.mkdir(parents=True, exist_ok=True)
 
-    for zip_name, url in files:
-        zip_path = RAW_DIR / zip_name
-        trimestre = zip_path.stem  # ex: 1T2025
+    items = [(url, RAW_DIR / zip_name) for zip_name, url in files]
+    logger.info(f"Baixando {len(items)} arquivos: {', '.join(name for name, _ in files)}")
+    zip_paths = download_all(items)
 
-        logger.info(f"Baixando {zip_name}")
-        r = requests.get(url, stream=True, timeout=30)
-        r.raise_for_status()
+    if STREAM_ZIP_MEMBERS:
+        logger.info("Modo streaming: membros serão lidos direto dos ZIPs, sem extração")
+        logger.info("Download concluído")
+        return zip_paths
 
-        with open(zip_path, "wb") as f:
-            for chunk in r.iter_content(8192):
-                f.write(chunk)
+    for zip_path in zip_paths:
+        trimestre = zip_path.stem  # ex: 1T2025
 
         logger.info(f"Extraindo arquivos do trimestre {trimestre}")
 
         with zipfile.ZipFile(zip_path) as z:
-            extracted_count = 0
-
-            for member in z.namelist():
-                if member.endswith("/"):
-                    continue
-
-                extracted_count += 1
-                ext = member.split(".")[-1]
-                suffix = f"_{extracted_count}" if extracted_count > 1 else ""
-                new_name = f"{trimestre}{suffix}.{ext}"
-
+            for member, new_name in iter_members(z, trimestre):
                 target_path = EXTRACT_DIR / new_name
 
                 with z.open(member) as source, open(target_path, "wb") as target:
-                    target.write(source.read())
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
 
                 logger.info(f"Arquivo extraído: {new_name}")
 
     logger.info("Download e extração concluídos")
+    return zip_paths
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import time
+import requests
+from pathlib import Path
+from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from scripts.config import logger, DOWNLOAD_WORKERS, DOWNLOAD_RETRIES, DOWNLOAD_BACKOFF_S
+
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT = 30
+BACKOFF_MAX_S = 60
+
+ERROS_REDE = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+def _retryable(e: requests.RequestException) -> bool:
+    """Falhas de rede e respostas transitórias (429 e 5xx) merecem nova tentativa"""
+    if isinstance(e, requests.HTTPError):
+        status = e.response.status_code if e.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    return isinstance(e, ERROS_REDE)
+
+
+def _wait(tentativa: int, retries: int, e: Optional[requests.RequestException] = None):
+    """Espera exponencial entre tentativas (respeita Retry-After em segundos, se maior)"""
+    if tentativa >= retries:
+        return
+    delay = min(BACKOFF_MAX_S, DOWNLOAD_BACKOFF_S * 2 ** (tentativa - 1))
+    retry_after = e.response.headers.get("Retry-After", "") if getattr(e, "response", None) is not None else ""
+    if retry_after.isdigit():
+        delay = max(delay, min(BACKOFF_MAX_S, int(retry_after)))
+    time.sleep(delay)
+
+
+def meta_path(path: Path) -> Path:
+    """Arquivo lateral com tamanho e sha256 de um download concluído"""
+    return path.with_name(path.name + ".meta.json")
+
+
+def part_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+def part_meta_path(path: Path) -> Path:
+    """Arquivo lateral do `.part`: ETag/Last-Modified da versão remota que está sendo baixada"""
+    return path.with_name(path.name + ".part.json")
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+
+
+def _write_json(path: Path, data: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def read_meta(path: Path) -> Optional[dict]:
+    return _read_json(meta_path(path))
+
+
+def is_complete(path: Path, remote_size: Optional[int] = None) -> bool:
+    """
+    Um ZIP é considerado completo quando existe, bate com o tamanho e o
+    sha256 gravados no .meta.json e (se conhecido) com o tamanho remoto.
+    """
+    meta = read_meta(path)
+    if not meta or not path.exists():
+        return False
+
+    size = path.stat().st_size
+    if size != meta.get("size"):
+        return False
+    if remote_size is not None and size != remote_size:
+        return False
+
+    return sha256_file(path) == meta.get("sha256")
+
+
+def new_session(workers: int = DOWNLOAD_WORKERS) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _content_length(r: requests.Response) -> Optional[int]:
+    length = r.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() and "Content-Encoding" not in r.headers else None
+
+
+def _range_total(r: requests.Response) -> Optional[int]:
+    # Content-Range: bytes 100-199/200 (206) ou bytes */200 (416)
+    total = r.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _validators(r: requests.Response) -> dict:
+    return {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
+
+def remote_head(session: requests.Session, url: str) -> dict:
+    """Tamanho e validadores (ETag/Last-Modified) remotos; vazio se o HEAD falhar"""
+    try:
+        r = session.head(url, allow_redirects=True, timeout=TIMEOUT)
+        r.raise_for_status()
+    except requests.RequestException:
+        return {}
+    return {"size": _content_length(r), **_validators(r)}
+
+
+def remote_size(session: requests.Session, url: str) -> Optional[int]:
+    return remote_head(session, url).get("size")
+
+
+def _if_range(info: Optional[dict]) -> Optional[str]:
+    # If-Range só aceita ETag forte; senão vale o Last-Modified
+    if not info:
+        return None
+    etag = info.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return info.get("last_modified")
+
+
+def _remote_changed(info: dict, head: dict) -> bool:
+    return any(
+        info.get(k) and head.get(k) and info[k] != head[k]
+        for k in ("etag", "last_modified")
+    )
+
+
+def _discard_part(dest: Path):
+    part_path(dest).unlink(missing_ok=True)
+    part_meta_path(dest).unlink(missing_ok=True)
+
+
+def download_file(
+    url: str,
+    dest: Path,
+    session: Optional[requests.Session] = None,
+    retries: int = DOWNLOAD_RETRIES
+) -> Path:
+    """
+    Baixa `url` em `dest` retomando de um `.part` existente via Range.
+    O `.part` guarda ao lado (`.part.json`) o ETag/Last-Modified da versão
+    remota; a retomada envia If-Range e o `.part` é descartado se a origem
+    mudou (ou se não há validador para conferir). Falhas de rede, 429 e
+    5xx são tentadas de novo com espera exponencial. Downloads já
+    concluídos (tamanho + sha256 conferidos) não são refeitos.
+    """
+    session = session or new_session(1)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    head = remote_head(session, url)
+    total = head.get("size")
+    if is_complete(dest, total):
+        logger.info(f"{dest.name} já baixado e íntegro, download ignorado")
+        return dest
+
+    part = part_path(dest)
+
+    for tentativa in range(1, retries + 1):
+        offset = part.stat().st_size if part.exists() else 0
+        info = _read_json(part_meta_path(dest)) if offset else None
+        validator = _if_range(info)
+        if offset and (validator is None or _remote_changed(info, head) or (total is not None and offset > total)):
+            logger.info(f"{part.name} descartado: arquivo remoto mudou ou sem validador para retomar")
+            _discard_part(dest)
+            offset = 0
+
+        h = hashlib.sha256()
+        if offset:
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+
+        try:
+            with session.get(url, stream=True, timeout=TIMEOUT, headers=headers) as r:
+                if r.status_code == 416 and offset:
+                    if offset != (_range_total(r) or total):
+                        logger.warning(f"Range fora do arquivo remoto para {dest.name}, reiniciando")
+                        _discard_part(dest)
+                        continue
+                    # .part já contém o arquivo inteiro
+                    total = offset
+                else:
+                    r.raise_for_status()
+
+                    if offset and r.status_code != 206:
+                        # If-Range não bateu (origem mudou) ou servidor sem Range: recomeça do zero
+                        logger.info(f"{dest.name} mudou na origem ou servidor sem suporte a Range, reiniciando")
+                        offset = 0
+                        h = hashlib.sha256()
+                    elif offset:
+                        logger.info(f"Retomando {dest.name} a partir do byte {offset:,}")
+
+                    if r.status_code == 206:
+                        total = _range_total(r) or total
+                    else:
+                        total = _content_length(r) or total
+                        _write_json(part_meta_path(dest), {"url": url, **_validators(r)})
+
+                    with open(part, "ab" if offset else "wb") as f:
+                        for chunk in r.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            h.update(chunk)
+        except requests.RequestException as e:
+            if not _retryable(e):
+                raise
+            logger.warning(f"Falha ao baixar {dest.name} (tentativa {tentativa}/{retries}): {e}")
+            _wait(tentativa, retries, e)
+            continue
+
+        size = part.stat().st_size
+        if total is not None and size != total:
+            logger.warning(
+                f"Download incompleto de {dest.name}: {size:,} de {total:,} bytes "
+                f"(tentativa {tentativa}/{retries})"
+            )
+            _wait(tentativa, retries)
+            continue
+
+        part.replace(dest)
+        part_meta_path(dest).unlink(missing_ok=True)
+        meta_path(dest).write_text(
+            json.dumps({"url": url, "size": size, "sha256": h.hexdigest()}, indent=2),
+            encoding="utf-8"
+        )
+        logger.info(f"Download concluído: {dest.name} ({size:,} bytes)")
+        return dest
+
+    raise RuntimeError(f"Não foi possível baixar {url} após {retries} tentativas")
+
+
+def _write_meta(dest: Path, meta: dict):
+    _write_json(meta_path(dest), meta)
+
+
+def download_if_changed(
+    url: str,
+    dest: Path,
+    session: Optional[requests.Session] = None,
+    retries: int = DOWNLOAD_RETRIES
+) -> bool:
+    """
+    Download condicional: envia o ETag/Last-Modified do último download
+    (If-None-Match/If-Modified-Since) e mantém a cópia local num 304.
+    O corpo vai em streaming para um `.part`, com sha256, e substitui
+    `dest` por rename atômico. Se o servidor ignorar a condição e devolver
+    o mesmo conteúdo, `dest` não é tocado (mtime preservado).
+    Retorna True se o arquivo local mudou.
+    """
+    session = session or new_session(1)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    meta = read_meta(dest)
+    intact = bool(meta) and dest.exists() and dest.stat().st_size == meta.get("size")
+    headers = {}
+    if intact:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    part = part_path(dest)
+
+    for tentativa in range(1, retries + 1):
+        h = hashlib.sha256()
+        try:
+            with session.get(url, stream=True, timeout=TIMEOUT, headers=headers) as r:
+                if r.status_code == 304:
+                    logger.info(f"{dest.name} não mudou na origem (304), cópia local mantida")
+                    return False
+                r.raise_for_status()
+
+                total = _content_length(r)
+                etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+
+                with open(part, "wb") as f:
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        h.update(chunk)
+        except requests.RequestException as e:
+            if not _retryable(e):
+                raise
+            logger.warning(f"Falha ao baixar {dest.name} (tentativa {tentativa}/{retries}): {e}")
+            _wait(tentativa, retries, e)
+            continue
+
+        size = part.stat().st_size
+        if total is not None and size != total:
+            logger.warning(
+                f"Download incompleto de {dest.name}: {size:,} de {total:,} bytes "
+                f"(tentativa {tentativa}/{retries})"
+            )
+            _wait(tentativa, retries)
+            continue
+
+        sha256 = h.hexdigest()
+        new_meta = {"url": url, "size": size, "sha256": sha256, "etag": etag, "last_modified": last_modified}
+
+        if intact and sha256 == meta.get("sha256"):
+            part.unlink()
+            _write_meta(dest, new_meta)
+            logger.info(f"{dest.name} baixado sem alterações de conteúdo, cópia local mantida")
+            return False
+
+        part.replace(dest)
+        _write_meta(dest, new_meta)
+        logger.info(f"Download concluído: {dest.name} ({size:,} bytes, sha256 {sha256[:12]})")
+        return True
+
+    raise RuntimeError(f"Não foi possível baixar {url} após {retries} tentativas")
+
+
+def download_all(
+    items: List[Tuple[str, Path]],
+    workers: int = DOWNLOAD_WORKERS,
+    session: Optional[requests.Session] = None
+) -> List[Path]:
+    """Baixa vários arquivos com um pool limitado de threads, preservando a ordem de `items`"""
+    session = session or new_session(workers)
+    results: List[Optional[Path]] = [None] * len(items)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(download_file, url, dest, session): i
+            for i, (url, dest) in enumerate(items)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return results
@@ -1,27 +1,55 @@
-from scripts.config import logger
+import argparse
+from typing import List, Optional, Tuple
+from scripts.config import logger, RAW_DIR, EXTRACT_DIR, PROCESSED_DIR, STREAM_ZIP_MEMBERS, INTERMEDIATE_FORMAT
 from scripts.etapa1.extract.download import download_and_extract
 from scripts.etapa1.transform.processing import process
-from scripts.etapa1.consolidate.consolidation import consolidate
+from scripts.etapa1.consolidate.consolidation import consolidate, OUTPUT, ZIP_FILE, AUDIT
 from scripts.etapa1.analysis.resumo_processado import resumo_processado
-
-
-
-
-
-
-
-
-def main():
+from scripts.etapa1.manifest import NORMALIZED, CONSOLIDATED
+from scripts.utils.pipeline import Pipeline, Stage
+
+
+def stages(anos: Optional[Tuple[int, int]] = None) -> List[Stage]:
+    """Etapas da Etapa 1 com seus artefatos de entrada e saída"""
+    anos_processo = range(anos[0], anos[1] + 1) if anos else None
+    brutos = [RAW_DIR / "*.zip"] + ([] if STREAM_ZIP_MEMBERS else [EXTRACT_DIR])
+
+    return [
+        # sempre roda: consulta a ANS e só baixa o que mudou
+        Stage("download_demonstracoes", lambda: download_and_extract(anos), outputs=brutos, always=True),
+        Stage(
+            "processamento",
+            lambda: process(anos=anos_processo),
+            inputs=brutos,
+            outputs=[PROCESSED_DIR / NORMALIZED],
+            params={"anos": anos, "formato": INTERMEDIATE_FORMAT},
+        ),
+        Stage(
+            "consolidacao",
+            consolidate,
+            inputs=[PROCESSED_DIR / NORMALIZED],
+            outputs=[PROCESSED_DIR / CONSOLIDATED, OUTPUT, ZIP_FILE, AUDIT],
+        ),
+        Stage("resumo", resumo_processado, inputs=[AUDIT], always=True),
+    ]
+
+
+def parse_anos(ano_inicial: Optional[int], ano_final: Optional[int]) -> Optional[Tuple[int, int]]:
+    if ano_inicial is None and ano_final is None:
+        return None
+    return (ano_inicial or ano_final, ano_final or ano_inicial)
+
+
+def main(ano_inicial: int = None, ano_final: int = None, forcar: bool = False):
     logger.info(" PIPELINE 1 INICIADO")
-    download_and_extract()
-    process()
-    consolidate()
-    resumo_processado()
+    Pipeline(stages(parse_anos(ano_inicial, ano_final))).run(force=forcar)
     logger.info(" PIPELINE 1 FINALIZADO COM SUCESSO")
 
 
 if __name__ == "__main__":
-    main()
-
-
-
+    parser = argparse.ArgumentParser(description="Pipeline da Etapa 1")
+    parser.add_argument("--ano-inicial", type=int, help="backfill: primeiro ano a baixar")
+    parser.add_argument("--ano-final", type=int, help="backfill: último ano a baixar")
+    parser.add_argument("--forcar", action="store_true", help="executa todas as etapas, mesmo sem alterações")
+    args = parser.parse_args()
+    main(args.ano_inicial, args.ano_final, args.forcar)
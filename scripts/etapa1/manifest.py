@@ -0,0 +1,147 @@
+import hashlib
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from scripts.config import logger, RAW_DIR, PROCESSED_DIR
+from scripts.etapa1.extract.downloader import CHUNK_SIZE, read_meta, sha256_file
+from scripts.etapa1.transform.sources import Source
+from scripts.utils.table_io import partition_path
+
+MANIFEST_FILE = PROCESSED_DIR / "manifesto.json"
+QUARTER_RE = re.compile(r"^([1-4])T(\d{4})$", re.IGNORECASE)
+
+# intermediários particionados por ano=YYYY/trimestre=N
+NORMALIZED = "despesas_normalizadas"
+CONSOLIDATED = "consolidado_despesas"
+DATASETS = [NORMALIZED, CONSOLIDATED]
+
+
+def quarter_of(source: Source) -> str:
+    """Trimestre de origem de um arquivo (ex: 1T2025_2.csv -> 1T2025)"""
+    return Path(source.name).stem.split("_")[0]
+
+
+def quarter_partition(quarter: str) -> Optional[Tuple[int, int]]:
+    """1T2025 -> (2025, 1); None se o nome não segue o padrão da ANS"""
+    m = QUARTER_RE.match(quarter)
+    return (int(m.group(2)), int(m.group(1))) if m else None
+
+
+def quarter_path(dataset: str, quarter: str) -> Path:
+    ano, trimestre = quarter_partition(quarter)
+    return partition_path(dataset, ano, trimestre)
+
+
+def remove_quarter(quarter: str):
+    """Apaga as partições do trimestre em todos os intermediários (qualquer formato)"""
+    for dataset in DATASETS:
+        folder = quarter_path(dataset, quarter).parent
+        if folder.exists():
+            for file in folder.iterdir():
+                file.unlink()
+            folder.rmdir()
+            if not any(folder.parent.iterdir()):
+                folder.parent.rmdir()
+
+
+def fingerprint(quarter: str, sources: List[Source]) -> dict:
+    """
+    Identidade do conteúdo de um trimestre: url/tamanho/sha256 do ZIP
+    (do .meta.json gravado no download, sem reler o arquivo) ou, sem ZIP,
+    o hash dos arquivos extraídos.
+    """
+    zip_path = RAW_DIR / f"{quarter}.zip"
+    if zip_path.exists():
+        size = zip_path.stat().st_size
+        meta = read_meta(zip_path)
+        if meta and meta.get("size") == size:
+            return {"url": meta.get("url"), "size": size, "sha256": meta.get("sha256")}
+        return {"url": None, "size": size, "sha256": sha256_file(zip_path)}
+
+    h = hashlib.sha256()
+    size = 0
+    for source in sources:
+        h.update(source.name.encode("utf-8"))
+        with source.open() as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                size += len(chunk)
+    return {"url": None, "size": size, "sha256": h.hexdigest()}
+
+
+class Manifest:
+    """
+    Registro dos trimestres já processados (manifesto.json): origem
+    (url, tamanho, sha256), partição normalizada do trimestre, quantidade de
+    linhas e posição (offset em linhas) no conjunto completo, na ordem
+    (ano, trimestre).
+    Permite refazer apenas os trimestres novos ou alterados.
+    """
+
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = path
+        self.quarters: Dict[str, dict] = {}
+        if path.exists():
+            try:
+                self.quarters = json.loads(path.read_text(encoding="utf-8")).get("trimestres", {})
+            except ValueError:
+                logger.warning(f"{path.name} inválido, reprocessando tudo")
+
+    def relative(self, path: Path) -> str:
+        return path.relative_to(self.path.parent).as_posix()
+
+    def path_of(self, quarter: str) -> Path:
+        return self.path.parent / self.quarters[quarter]["arquivo"]
+
+    def get(self, quarter: str) -> Optional[dict]:
+        return self.quarters.get(quarter)
+
+    def is_current(self, quarter: str, origem: dict, output: Path) -> bool:
+        entry = self.quarters.get(quarter)
+        if not entry or entry.get("sha256") != origem["sha256"]:
+            return False
+        if entry.get("arquivo") != self.relative(output):
+            return False  # formato intermediário mudou
+        return entry.get("linhas", 0) == 0 or output.exists()
+
+    def update(self, quarter: str, origem: dict, output: Path, linhas: int):
+        self.quarters[quarter] = {
+            **origem,
+            "arquivo": self.relative(output),
+            "linhas": int(linhas),
+            "processado_em": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def retain(self, quarters: List[str], anos: Optional[Iterable[int]] = None):
+        """
+        Remove do manifesto (e do disco) trimestres que não existem mais na
+        origem; com `anos`, só trimestres desses anos são considerados.
+        """
+        anos = set(anos) if anos is not None else None
+        for quarter in list(self.quarters):
+            if anos is not None and quarter_partition(quarter)[0] not in anos:
+                continue
+            if quarter not in quarters:
+                logger.info(f"Trimestre {quarter} não está mais na origem, removido do manifesto")
+                remove_quarter(quarter)
+                del self.quarters[quarter]
+
+    def ordered(self) -> List[str]:
+        return sorted(self.quarters, key=quarter_partition)
+
+    def set_offsets(self):
+        offset = 0
+        for quarter in self.ordered():
+            entry = self.quarters[quarter]
+            entry["offset"] = offset
+            offset += entry["linhas"]
+
+    def save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"trimestres": self.quarters}, indent=2, ensure_ascii=False),
+            encoding="utf-8"
+        )
+        tmp.replace(self.path)
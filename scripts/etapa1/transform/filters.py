@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from scripts.config import logger
+
+
+@dataclass(frozen=True)
+class AccountRule:
+    """
+    Regra declarativa de seleção de contas.
+    `contains`: trechos procurados na descrição (sem diferenciar maiúsculas).
+    `prefixes`: prefixos de CD_CONTA_CONTABIL.
+    Critérios preenchidos na mesma regra são combinados com E; regras
+    diferentes de um mesmo filtro são combinadas com OU.
+    """
+    name: str
+    contains: Tuple[str, ...] = ()
+    prefixes: Tuple[str, ...] = ()
+
+
+DESPESA_RULES: List[AccountRule] = [
+    AccountRule("eventos_sinistros", contains=("EVENTOS/SINISTROS",)),
+]
+
+
+class PrefixTrie:
+    """Trie de prefixos de código contábil: responde se algum prefixo cadastrado inicia o código"""
+
+    _END = "$"
+
+    def __init__(self, prefixes: Iterable[str] = ()):
+        self.root: Dict[str, dict] = {}
+        for prefix in prefixes:
+            self.insert(prefix)
+
+    def insert(self, prefix: str):
+        node = self.root
+        for char in str(prefix).strip():
+            node = node.setdefault(char, {})
+        node[self._END] = {}
+
+    def matches(self, code: str) -> bool:
+        node = self.root
+        for char in str(code).strip():
+            if self._END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return self._END in node
+
+
+def _as_bool(mask: pd.Series) -> np.ndarray:
+    return mask.fillna(False).to_numpy(dtype=bool)
+
+
+class AccountFilter:
+    """
+    Avalia as regras sobre um chunk inteiro e devolve uma máscara booleana.
+    Para regras de prefixo, cada código distinto passa pela trie uma única
+    vez por instância (use uma instância por arquivo).
+    """
+
+    def __init__(self, rules: Sequence[AccountRule] = DESPESA_RULES):
+        self.rules = list(rules)
+        self._tries = {rule.name: PrefixTrie(rule.prefixes) for rule in self.rules if rule.prefixes}
+        self._matching_codes: Dict[str, set] = {name: set() for name in self._tries}
+        self._seen_codes: Dict[str, set] = {name: set() for name in self._tries}
+        self.counts: Dict[str, int] = {rule.name: 0 for rule in self.rules}
+
+    @property
+    def needs_codes(self) -> bool:
+        return bool(self._tries)
+
+    def _prefix_mask(self, rule: AccountRule, codes: pd.Series) -> np.ndarray:
+        trie = self._tries[rule.name]
+        seen = self._seen_codes[rule.name]
+        matching = self._matching_codes[rule.name]
+
+        for code in codes.dropna().unique():
+            if code not in seen:
+                seen.add(code)
+                if trie.matches(code):
+                    matching.add(code)
+
+        return codes.isin(matching).to_numpy(dtype=bool)
+
+    def mask(self, chunk: pd.DataFrame, desc_col: str = "DESCRICAO", code_col: str = "CD_CONTA_CONTABIL") -> np.ndarray:
+        result = np.zeros(len(chunk), dtype=bool)
+        upper: Optional[pd.Series] = None
+
+        for rule in self.rules:
+            rule_mask = np.ones(len(chunk), dtype=bool)
+
+            if rule.contains:
+                if upper is None:
+                    upper = chunk[desc_col].str.upper()
+                contains = np.zeros(len(chunk), dtype=bool)
+                for text in rule.contains:
+                    contains |= _as_bool(upper.str.contains(text.upper(), regex=False))
+                rule_mask &= contains
+
+            if rule.prefixes:
+                if code_col not in chunk.columns:
+                    logger.warning(f"Regra {rule.name}: coluna {code_col} ausente, nenhuma conta selecionada")
+                    rule_mask[:] = False
+                else:
+                    rule_mask &= self._prefix_mask(rule, chunk[code_col])
+
+            self.counts[rule.name] += int(rule_mask.sum())
+            result |= rule_mask
+
+        return result
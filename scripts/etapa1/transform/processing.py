@@ -1,108 +1,80 @@
 import pandas as pd
-from scripts.config import logger, EXTRACT_DIR, PROCESSED_DIR
-from scripts.utils.date_utils import extract_year_quarter
-
-OUTPUT_FILE = PROCESSED_DIR / "despesas_normalizadas.csv"
-
-
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df.columns = (
-        df.columns.astype(str)
-        .str.strip()
-        .str.upper()
-        .str.replace(" ", "_")
-    )
-    return df
-
-
-def clean_numeric(series: pd.Series) -> pd.Series:
-    return pd.to_numeric(
-        series.astype(str)
-        .str.replace(".", "", regex=False)
-        .str.replace(",", ".", regex=False),
-        errors="coerce"
-    )
-
-
-def find_column(df, keywords):
-    for col in df.columns:
-        if any(k in col for k in keywords):
-            return col
-    return None
-
-
-def is_despesa(text: str) -> bool:
-    return "EVENTOS/SINISTROS" in str(text).upper()
-
-
-def process():
-    logger.info("Processamento iniciado")
-
-    # 🔑 garante que a pasta existe (caso tenha sido apagada)
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-
-    if OUTPUT_FILE.exists():
-        OUTPUT_FILE.unlink()
-
-    total_rows = 0
-
-    for file in EXTRACT_DIR.rglob("*"):
-        if not file.is_file() or file.suffix.lower() not in [".csv", ".txt", ".xlsx"]:
-            continue
-
-        logger.info(f"📂 Lendo arquivo extraído: {file.name}")
-
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from scripts.config import logger, PROCESSED_DIR, TRANSFORM_WORKERS, INCREMENTAL
+from scripts.etapa1.manifest import (
+    Manifest, NORMALIZED, fingerprint, quarter_of, quarter_partition, quarter_path, remove_quarter
+)
+from scripts.etapa1.transform.filters import AccountFilter, AccountRule, DESPESA_RULES
+from scripts.etapa1.transform.reader import read_csv_columns, read_excel_columns
+from scripts.etapa1.transform.sources import Source, list_sources
+from scripts.utils.date_utils import derive_periods
+from scripts.utils.decimal_utils import parse_brl_cents
+from scripts.utils.metrics import instrumented
+from scripts.utils.schema import MemoryReport, apply_schema
+from scripts.utils.table_io import TableWriter, merge_tables
+
+PARTIALS_DIR = PROCESSED_DIR / "parciais"
+
+
+def read_chunks(source: Source, fh, optional: Sequence[str] = ()) -> Iterable[pd.DataFrame]:
+    if source.suffix == ".xlsx":
+        return read_excel_columns(fh, source.name, optional)
+    return read_csv_columns(fh, source.name, optional)
+
+
+def process_source(
+    source: Source,
+    writer: TableWriter,
+    rules: Sequence[AccountRule] = DESPESA_RULES
+) -> Tuple[int, int]:
+    """Filtra e normaliza um arquivo, anexando o resultado em `writer`; retorna (linhas lidas, gravadas)"""
+    file = Path(source.name)
+    lidas = 0
+    rows = 0
+    account_filter = AccountFilter(rules)
+    memoria = MemoryReport(f"etapa1.processamento {file.name}")
+    optional = ["DATA"] + (["CD_CONTA_CONTABIL"] if account_filter.needs_codes else [])
+
+    logger.info(f"📂 Lendo arquivo: {source.name}")
+
+    with source.open() as fh:
         try:
-            if file.suffix == ".xlsx":
-                chunks = [pd.read_excel(file)]
-            else:
-                chunks = pd.read_csv(
-                    file,
-                    sep=";",
-                    encoding="latin1",
-                    chunksize=100_000,
-                    low_memory=False
-                )
+            chunks = read_chunks(source, fh, optional)
         except Exception as e:
             logger.error(f"Erro ao ler {file.name}: {e}")
-            continue
+            return lidas, rows
 
         for chunk in chunks:
-            chunk = normalize_columns(chunk)
-
-            desc_col = find_column(chunk, ["DESCRICAO", "DS_CONTA", "NOME_CONTA"])
-            reg_col = find_column(chunk, ["REG_ANS", "REGISTRO"])
-            saldo_ini_col = find_column(chunk, ["VL_SALDO_INICIAL"])
-            saldo_fim_col = find_column(chunk, ["VL_SALDO_FINAL"])
-
-            if not all([desc_col, reg_col, saldo_ini_col, saldo_fim_col]):
-                continue
+            lidas += len(chunk)
 
             # Filtra apenas despesas
-            chunk = chunk[chunk[desc_col].apply(is_despesa)]
+            chunk = chunk[account_filter.mask(chunk)]
             if chunk.empty:
                 continue
 
-            # Limpeza numérica
-            chunk["SALDO_INICIAL"] = clean_numeric(chunk[saldo_ini_col])
-            chunk["SALDO_FINAL"] = clean_numeric(chunk[saldo_fim_col])
+            # Limpeza numérica: centavos inteiros, sem arredondamento de float
+            chunk["SALDO_INICIAL"] = parse_brl_cents(chunk["VL_SALDO_INICIAL"])
+            chunk["SALDO_FINAL"] = parse_brl_cents(chunk["VL_SALDO_FINAL"])
 
             # Cálculo da despesa
             chunk["VALOR_DESPESAS"] = chunk["SALDO_FINAL"] - chunk["SALDO_INICIAL"]
-            chunk = chunk[chunk["VALOR_DESPESAS"] > 0]
+            chunk = chunk[(chunk["VALOR_DESPESAS"] > 0).fillna(False)]
 
             if chunk.empty:
                 continue
 
-            # Ano e trimestre
-            ano, trimestre = extract_year_quarter(file, chunk)
+            # Ano e trimestre por linha (DATA, com o nome do arquivo como reserva)
+            ano, trimestre = derive_periods(file, chunk.get("DATA"), chunk.index)
 
-            final_chunk = pd.DataFrame({
-                "RegistroANS": chunk[reg_col].astype(str).str.zfill(6),
+            # registro ANS inteiro (Int32), ano/trimestre Int16: esquema compacto
+            final_chunk = apply_schema(pd.DataFrame({
+                "RegistroANS": chunk["REG_ANS"].str.strip(),
                 "Ano": ano,
                 "Trimestre": trimestre,
                 "ValorDespesas": chunk["VALOR_DESPESAS"]
-            })
+            }))
 
             final_chunk = final_chunk.dropna(
                 subset=["RegistroANS", "ValorDespesas"]
@@ -112,15 +84,121 @@ def process():
                 f"➡️ Processando {file.name} | Linhas válidas: {len(final_chunk)}"
             )
 
-            final_chunk.to_csv(
-                OUTPUT_FILE,
-                mode="a",
-                index=False,
-                header=not OUTPUT_FILE.exists(),
-                sep=";",
-                encoding="utf-8"
-            )
+            writer.write(final_chunk)
+            memoria.add(final_chunk)
+
+            rows += len(final_chunk)
+
+    memoria.log()
+    logger.info(f"{file.name} | Contas selecionadas por regra: {account_filter.counts}")
+    return lidas, rows
+
+
+def process_source_to(source: Source, output: Path) -> Tuple[int, int]:
+    """Processa um arquivo gravando em `output` próprio (usado pelos workers)"""
+    with TableWriter(output) as writer:
+        return process_source(source, writer)
+
+
+def process_parallel(sources: List[Source], outputs: List[Path], workers: int) -> List[Tuple[int, int]]:
+    """
+    Cada arquivo é processado por um worker do ProcessPoolExecutor, que grava
+    sua própria saída parcial; as parciais de cada partição são unidas na
+    ordem de `sources`. `outputs[i]` é a partição de `sources[i]`.
+    """
+    PARTIALS_DIR.mkdir(parents=True, exist_ok=True)
+    partials = [
+        PARTIALS_DIR / f"{i:04d}_{Path(s.name).stem}{o.suffix}"
+        for i, (s, o) in enumerate(zip(sources, outputs))
+    ]
+    for partial in partials:
+        if partial.exists():
+            partial.unlink()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(process_source_to, sources, partials))
+
+    for output in dict.fromkeys(outputs):
+        output.parent.mkdir(parents=True, exist_ok=True)
+        merge_tables([p for p, o in zip(partials, outputs) if o == output], output)
+    return counts
+
+
+def group_by_quarter(sources: List[Source], anos: Optional[Iterable[int]] = None) -> Dict[str, List[Source]]:
+    anos = set(anos) if anos is not None else None
+    by_quarter: Dict[str, List[Source]] = {}
+    for source in sources:
+        quarter = quarter_of(source)
+        partition = quarter_partition(quarter)
+        if partition is None:
+            logger.warning(f"{source.name}: nome fora do padrão NTAAAA, arquivo ignorado")
+            continue
+        if anos is None or partition[0] in anos:
+            by_quarter.setdefault(quarter, []).append(source)
+    return by_quarter
+
+
+@instrumented("etapa1.processamento", rows=lambda result, *a, **kw: result)
+def process(
+    workers: int = TRANSFORM_WORKERS,
+    incremental: bool = INCREMENTAL,
+    anos: Optional[Iterable[int]] = None
+):
+    """
+    Normaliza os arquivos de origem trimestre a trimestre. Cada trimestre
+    vira uma partição `despesas_normalizadas/ano=YYYY/trimestre=N/`,
+    registrada no manifesto; com `incremental`, só trimestres novos ou com
+    ZIP alterado são refeitos. `anos` restringe o processamento (backfill
+    por faixa de anos) sem tocar nas partições dos demais.
+    Retorna (linhas lidas, linhas gravadas) dos arquivos processados nesta execução.
+    """
+    logger.info("Processamento iniciado")
 
-            total_rows += len(final_chunk)
+    # 🔑 garante que a pasta existe (caso tenha sido apagada)
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
-    logger.info(f"Processamento concluído: {total_rows:,} registros")
+    anos = list(anos) if anos is not None else None
+    by_quarter = group_by_quarter(list_sources(), anos)
+
+    manifest = Manifest()
+    manifest.retain(list(by_quarter), anos)
+
+    pending = []
+    for quarter, quarter_sources in by_quarter.items():
+        origem = fingerprint(quarter, quarter_sources)
+        output = quarter_path(NORMALIZED, quarter)
+        if incremental and manifest.is_current(quarter, origem, output):
+            logger.info(f"Trimestre {quarter} sem alterações, reaproveitado")
+            continue
+        remove_quarter(quarter)
+        pending.append((quarter, origem, output))
+
+    # partições são independentes: os arquivos de todas vão para o mesmo pool
+    todo = [(s, output) for quarter, _, output in pending for s in by_quarter[quarter]]
+    workers = min(workers, len(todo))
+
+    if workers > 1:
+        logger.info(f"Processando {len(todo)} arquivos com {workers} processos")
+        counts = process_parallel([s for s, _ in todo], [o for _, o in todo], workers)
+    else:
+        counts = []
+        for quarter, _, output in pending:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            with TableWriter(output) as writer:
+                counts.extend(process_source(source, writer) for source in by_quarter[quarter])
+
+    linhas: Dict[Path, int] = {}
+    for (_, output), (_, count) in zip(todo, counts):
+        linhas[output] = linhas.get(output, 0) + count
+    for quarter, origem, output in pending:
+        manifest.update(quarter, origem, output, linhas.get(output, 0))
+
+    manifest.set_offsets()
+    manifest.save()
+
+    total_rows = sum(manifest.get(q)["linhas"] for q in by_quarter)
+    logger.info(
+        f"Processamento concluído: {total_rows:,} registros "
+        f"({len(pending)} de {len(by_quarter)} trimestres reprocessados)"
+    )
+    return sum(c[0] for c in counts), sum(c[1] for c in counts)
@@ -0,0 +1,219 @@
+import csv
+import io
+import shutil
+import tempfile
+import numpy as np
+import openpyxl
+import pandas as pd
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+from scripts.config import logger, CSV_ENGINE
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow é opcional
+    pa = None
+    pa_csv = None
+
+CHUNK_SIZE = 100_000
+ENCODING = "latin1"
+SEP = ";"
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+ARROW_TYPES = {pa.string(): pd.StringDtype("pyarrow")} if pa is not None else {}
+
+# coluna canônica -> palavras-chave aceitas no cabeçalho normalizado
+COLUMNS: Dict[str, List[str]] = {
+    "DESCRICAO": ["DESCRICAO", "DS_CONTA", "NOME_CONTA"],
+    "REG_ANS": ["REG_ANS", "REGISTRO"],
+    "VL_SALDO_INICIAL": ["VL_SALDO_INICIAL"],
+    "VL_SALDO_FINAL": ["VL_SALDO_FINAL"],
+}
+
+# colunas lidas apenas quando pedidas e presentes no arquivo
+OPTIONAL_COLUMNS: Dict[str, List[str]] = {
+    "CD_CONTA_CONTABIL": ["CD_CONTA_CONTABIL"],
+    "DATA": ["DATA"],
+}
+
+
+def normalize_name(name: str) -> str:
+    return str(name).strip().upper().replace(" ", "_")
+
+
+def parse_header(line: str) -> List[str]:
+    """Divide a linha de cabeçalho, renomeando duplicadas como o pandas (X, X.1, ...)"""
+    return dedupe_names(next(csv.reader([line.rstrip("\r\n")], delimiter=SEP)))
+
+
+def dedupe_names(names: Sequence[str]) -> List[str]:
+    seen: Dict[str, int] = {}
+    unique = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        unique.append(name)
+    return unique
+
+
+def resolve_columns(header: List[str], optional: Sequence[str] = ()) -> Optional[Dict[str, str]]:
+    """
+    Resolve, uma única vez por arquivo, qual coluna original atende cada
+    coluna canônica. Retorna None se alguma obrigatória não existir;
+    opcionais ausentes são apenas omitidas.
+    """
+    normalized = [normalize_name(h) for h in header]
+
+    def find(keywords):
+        return next(
+            (orig for orig, norm in zip(header, normalized) if any(k in norm for k in keywords)),
+            None
+        )
+
+    resolved = {}
+    for canonical, keywords in COLUMNS.items():
+        match = find(keywords)
+        if match is None:
+            return None
+        resolved[canonical] = match
+
+    for canonical in optional:
+        match = find(OPTIONAL_COLUMNS[canonical])
+        if match is not None:
+            resolved[canonical] = match
+
+    return resolved
+
+
+def arrow_available() -> bool:
+    return pa_csv is not None and CSV_ENGINE in ("auto", "pyarrow")
+
+
+def _read_pandas(fh: BinaryIO, header: List[str], resolved: Dict[str, str]) -> Iterator[pd.DataFrame]:
+    rename = {orig: canonical for canonical, orig in resolved.items()}
+    chunks = pd.read_csv(
+        fh,
+        sep=SEP,
+        encoding=ENCODING,
+        header=None,
+        names=header,
+        usecols=list(rename),
+        dtype=str,
+        chunksize=CHUNK_SIZE
+    )
+    for chunk in chunks:
+        yield chunk.rename(columns=rename)
+
+
+def _read_arrow(fh: BinaryIO, header: List[str], resolved: Dict[str, str]) -> Iterator[pd.DataFrame]:
+    rename = {orig: canonical for canonical, orig in resolved.items()}
+    reader = pa_csv.open_csv(
+        fh,
+        read_options=pa_csv.ReadOptions(
+            column_names=header,
+            encoding=ENCODING,
+            block_size=ARROW_BLOCK_SIZE
+        ),
+        parse_options=pa_csv.ParseOptions(delimiter=SEP),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(rename),
+            column_types={c: pa.string() for c in rename},
+            strings_can_be_null=True
+        )
+    )
+    for batch in reader:
+        # strings Arrow: filtros .str rodam no motor do pyarrow
+        yield batch.to_pandas(types_mapper=ARROW_TYPES.get).rename(columns=rename)
+
+
+def read_csv_columns(fh: BinaryIO, name: str = "", optional: Sequence[str] = ()) -> Iterator[pd.DataFrame]:
+    """
+    Lê apenas as colunas de COLUMNS (e as opcionais pedidas), como texto, em blocos. O cabeçalho é
+    lido uma vez e o restante do arquivo é entregue ao pyarrow quando
+    disponível (CSV_ENGINE=auto|pyarrow) ou ao parser C do pandas.
+    """
+    header = parse_header(fh.readline().decode(ENCODING))
+    resolved = resolve_columns(header, optional)
+    if resolved is None:
+        logger.warning(f"{name}: colunas obrigatórias ausentes, arquivo ignorado")
+        return iter(())
+
+    if arrow_available():
+        return _read_arrow(fh, header, resolved)
+    return _read_pandas(fh, header, resolved)
+
+
+def _cell_text(value) -> Optional[str]:
+    """
+    Célula do Excel como texto no mesmo formato do CSV da ANS: números
+    viram decimal com vírgula, sem notação científica nem casas inventadas.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return np.format_float_positional(value, trim="-").replace(".", ",")
+    return str(value)
+
+
+def _seekable(fh: BinaryIO) -> Tuple[BinaryIO, bool]:
+    """
+    O openpyxl faz seeks aleatórios no XLSX (que também é um ZIP); num
+    membro comprimido de outro ZIP cada seek para trás recomeça a
+    descompressão, então o conteúdo é copiado para um arquivo temporário.
+    """
+    try:
+        fh.fileno()
+        return fh, False
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        tmp = tempfile.TemporaryFile()
+        shutil.copyfileobj(fh, tmp, 1024 * 1024)
+        tmp.seek(0)
+        return tmp, True
+
+
+def _iter_excel(workbook, rows, header: List[str], resolved: Dict[str, str], owned) -> Iterator[pd.DataFrame]:
+    positions = [header.index(orig) for orig in resolved.values()]
+    names = list(resolved)
+    try:
+        while True:
+            block = [
+                [_cell_text(row[i]) if i < len(row) else None for i in positions]
+                for row in islice(rows, CHUNK_SIZE)
+            ]
+            if not block:
+                break
+            yield pd.DataFrame(block, columns=names, dtype=object)
+    finally:
+        workbook.close()
+        if owned is not None:
+            owned.close()
+
+
+def read_excel_columns(fh: BinaryIO, name: str = "", optional: Sequence[str] = ()) -> Iterator[pd.DataFrame]:
+    """
+    Leitura em streaming da primeira planilha (openpyxl read-only): blocos
+    de CHUNK_SIZE linhas com as mesmas colunas canônicas e o mesmo formato
+    de texto do caminho CSV, sem carregar a planilha inteira.
+    """
+    fh, copied = _seekable(fh)
+    workbook = openpyxl.load_workbook(fh, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+    first = next(rows, ())
+    header = dedupe_names(["" if c is None else str(c) for c in first])
+    resolved = resolve_columns(header, optional)
+    if resolved is None:
+        workbook.close()
+        if copied:
+            fh.close()
+        logger.warning(f"{name}: colunas obrigatórias ausentes, arquivo ignorado")
+        return iter(())
+
+    return _iter_excel(workbook, rows, header, resolved, fh if copied else None)
@@ -0,0 +1,50 @@
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional
+from scripts.config import RAW_DIR, EXTRACT_DIR, STREAM_ZIP_MEMBERS
+from scripts.etapa1.extract.download import iter_members
+
+SUPPORTED_SUFFIXES = [".csv", ".txt", ".xlsx"]
+
+
+@dataclass(frozen=True)
+class Source:
+    """
+    Arquivo de entrada do processamento: um arquivo extraído em disco ou
+    um membro lido direto do ZIP (`member`), sem cópia intermediária.
+    """
+    name: str
+    path: Path
+    member: Optional[str] = None
+
+    @property
+    def suffix(self) -> str:
+        return Path(self.name).suffix.lower()
+
+    @contextmanager
+    def open(self) -> Iterator[BinaryIO]:
+        if self.member is None:
+            with open(self.path, "rb") as f:
+                yield f
+        else:
+            with zipfile.ZipFile(self.path) as z, z.open(self.member) as f:
+                yield f
+
+
+def list_sources(stream: bool = STREAM_ZIP_MEMBERS) -> List[Source]:
+    if not stream:
+        return [
+            Source(file.name, file)
+            for file in sorted(EXTRACT_DIR.rglob("*"))
+            if file.is_file() and file.suffix.lower() in SUPPORTED_SUFFIXES
+        ]
+
+    sources = []
+    for zip_path in sorted(RAW_DIR.glob("*.zip")):
+        with zipfile.ZipFile(zip_path) as z:
+            for member, new_name in iter_members(z, zip_path.stem):
+                if Path(new_name).suffix.lower() in SUPPORTED_SUFFIXES:
+                    sources.append(Source(new_name, zip_path, member))
+    return sources
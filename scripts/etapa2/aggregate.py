@@ -1,27 +1,51 @@
 import pandas as pd
+from typing import Iterable
 from scripts.config import logger
+from scripts.utils.metrics import instrumented
+from scripts.utils.decimal_utils import format_cents
+from scripts.utils.stats import combine_stats, finalize_stats, partial_stats
+
+CHAVES_AGREGACAO = ["RAZAO_SOCIAL", "UF"]
 
-def agregar_despesas(df: pd.DataFrame) -> pd.DataFrame:
-    logger.info("Agregação de despesas iniciada")
 
-    colunas_necessarias = ["RAZAO_SOCIAL", "UF", "ValorDespesas"]
+def estatisticas_parciais(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    n, soma, média e m2 de ValorDespesas (centavos) por Razão Social e UF.
+    Parciais de blocos ou trimestres diferentes são combinadas com
+    `agregar_parciais`, sem reler as linhas.
+    """
+    colunas_necessarias = CHAVES_AGREGACAO + ["ValorDespesas"]
     for c in colunas_necessarias:
         if c not in df.columns:
             raise ValueError(f"Colunas obrigatórias ausentes para agregação: {c}")
 
-    # Agrupar por RazaoSocial e UF
-    df_agg = df.groupby(
-        ["RAZAO_SOCIAL", "UF"], as_index=False
-    ).agg(
-        total_despesas=("ValorDespesas", lambda x: x[x != "INVÁLIDO"].sum()),
-        media_despesas=("ValorDespesas", lambda x: x[x != "INVÁLIDO"].mean()),
-        desvio_padrao=("ValorDespesas", lambda x: x[x != "INVÁLIDO"].std())
+    # inválidos são nulos após a validação e ficam fora da soma, média e desvio
+    return partial_stats(df, CHAVES_AGREGACAO, "ValorDespesas")
+
+
+def agregar_parciais(parciais: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Combina parciais e gera total, média e desvio padrão formatados"""
+    stats = finalize_stats(combine_stats(parciais, CHAVES_AGREGACAO))
+
+    df_agg = stats[CHAVES_AGREGACAO].assign(
+        total_despesas=stats["soma"],
+        media_despesas=stats["media"],
+        desvio_padrao=stats["desvio"],
     )
 
     # Ordenar por total_despesas decrescente
     df_agg = df_agg.sort_values("total_despesas", ascending=False)
 
-  
+    # Centavos -> decimal com 2 casas, pronto para NUMERIC(20,2)
+    for c in ["total_despesas", "media_despesas", "desvio_padrao"]:
+        df_agg[c] = format_cents(pd.Series(df_agg[c], dtype="Float64").round().astype("Int64"))
 
     return df_agg
 
+
+@instrumented("etapa2.agregacao")
+def agregar_despesas(df: pd.DataFrame) -> pd.DataFrame:
+    logger.info("Agregação de despesas iniciada")
+
+    # Agrupar por RazaoSocial e UF numa única passada vetorizada
+    return agregar_parciais([estatisticas_parciais(df)])
@@ -1,5 +1,6 @@
-import requests
 from scripts.config import RAW_DIR, logger
+from scripts.etapa1.extract.downloader import download_if_changed
+from scripts.utils.metrics import instrumented
 
 URL_OPERADORAS = (
     "https://dadosabertos.ans.gov.br/FTP/PDA/"
@@ -7,19 +8,23 @@ URL_OPERADORAS = (
     "Relatorio_cadop.csv"
 )
 
-def download_operadoras():
-    output_path = RAW_DIR / "operadoras_ativas.csv"
+OUTPUT_FILE = RAW_DIR / "operadoras_ativas.csv"
 
-    if output_path.exists():
-        logger.info("Arquivo de operadoras já existe. Removendo para novo download.")
-        output_path.unlink()
+@instrumented("etapa2.download_operadoras")
+def download_operadoras() -> bool:
+    """
+    Atualiza o cadastro de operadoras só se ele mudou na ANS (ETag /
+    Last-Modified e sha256 em operadoras_ativas.csv.meta.json).
+    Retorna True se o arquivo local foi substituído. Quando não muda, o
+    arquivo não é tocado e as etapas que o usam (enriquecimento, importação
+    da Etapa 3) são puladas pelo cache do pipeline.
+    """
+    logger.info("Verificando dados cadastrais das operadoras (ANS)")
+    changed = download_if_changed(URL_OPERADORAS, OUTPUT_FILE)
 
-    logger.info("Baixando dados cadastrais das operadoras (ANS)")
-    response = requests.get(URL_OPERADORAS, timeout=60)
-    response.raise_for_status()
+    if changed:
+        logger.info(f"Cadastro de operadoras atualizado em: {OUTPUT_FILE}")
+    else:
+        logger.info("Cadastro de operadoras inalterado")
 
-    output_path.write_bytes(response.content)
-
-    logger.info(f"Arquivo salvo em: {output_path}")
-
-    return output_path
+    return changed
@@ -0,0 +1,285 @@
+import numpy as np
+import pandas as pd
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from scripts.config import logger, PROCESSED_DIR, DUCKDB_MEMORY_LIMIT
+from scripts.etapa2.aggregate import CHAVES_AGREGACAO, agregar_parciais
+from scripts.etapa2.validate import VALIDATION_RULES
+from scripts.utils.metrics import instrumented
+from scripts.utils.registry import OperadoraRegistry
+from scripts.utils.schema import apply_schema
+from scripts.utils.table_io import TableWriter, table_format
+from scripts.utils.validation import REASONS_COLUMN, Validator
+
+try:
+    import duckdb
+except ImportError:  # duckdb é opcional (necessário só para ETAPA2_ENGINE=duckdb)
+    duckdb = None
+
+try:
+    import pyarrow.dataset as pa_ds
+except ImportError:  # pyarrow é opcional (necessário só para intermediários arrow)
+    pa_ds = None
+
+# arquivos temporários do DuckDB quando o JOIN/agregação não cabe na memória
+TEMP_DIR = PROCESSED_DIR / "duckdb_tmp"
+# vetores de 2048 linhas por bloco lido do resultado
+CHUNK_VECTORS = 50
+
+COLUNAS_CONSOLIDADO = ["RegistroANS", "Ano", "Trimestre", "ValorDespesas"]
+# coluna do consolidado enriquecido -> coluna do registro de operadoras
+COLUNAS_OPERADORA = {
+    "CNPJ": "cnpj",
+    "RAZAO_SOCIAL": "razao_social",
+    "Modalidade": "modalidade",
+    "UF": "uf",
+}
+
+
+def disponivel() -> bool:
+    return duckdb is not None
+
+
+def connect() -> "duckdb.DuckDBPyConnection":
+    if duckdb is None:
+        raise RuntimeError("ETAPA2_ENGINE=duckdb requer duckdb instalado")
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    config = {"temp_directory": str(TEMP_DIR), "preserve_insertion_order": True}
+    if DUCKDB_MEMORY_LIMIT:
+        config["memory_limit"] = DUCKDB_MEMORY_LIMIT
+    con = duckdb.connect(config=config)
+    con.execute("SET enable_progress_bar = false")
+    return con
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _files(paths: Sequence[Path]) -> str:
+    return "[" + ", ".join(_quote(str(p)) for p in paths) + "]"
+
+
+def _create_source(con, files: List[Path], anos: Optional[Sequence[int]] = None):
+    """
+    View `consolidado` sobre as partições, lidas direto do disco pelo
+    DuckDB (sem carregar o consolidado em memória), com os mesmos tipos
+    de read_dataset: chaves e centavos inteiros. `linha` guarda a ordem
+    de leitura, que o JOIN não preserva. Com `anos`, só as linhas desses
+    anos (coluna Ano) entram.
+    """
+    if not files:
+        vazio = pd.DataFrame({c: pd.array([], dtype="Int64") for c in ["linha"] + COLUNAS_CONSOLIDADO})
+        con.register("consolidado", vazio)
+        return
+
+    fmt = table_format(files[0])
+    # hive_partitioning=false: o Ano/Trimestre das pastas (trimestre do arquivo
+    # de origem) não pode sobrepor as colunas da linha (nomes sem caixa no DuckDB)
+    if fmt == "csv":
+        scan = (
+            f"read_csv({_files(files)}, delim=';', header=true, all_varchar=true, "
+            "union_by_name=true, hive_partitioning=false)"
+        )
+        # mesmas regras de read_table: to_numeric nas chaves e "1234.56" -> centavos
+        inteiro = "TRY_CAST(TRY_CAST(trim({0}::VARCHAR) AS DOUBLE) AS BIGINT)"
+        centavos = "CAST(TRY_CAST(trim({0}::VARCHAR, ' \"') AS DECIMAL(18, 2)) * 100 AS BIGINT)"
+    elif fmt == "parquet":
+        scan = f"read_parquet({_files(files)}, union_by_name=true, hive_partitioning=false)"
+        inteiro = centavos = "CAST({0} AS BIGINT)"
+    elif fmt == "arrow":
+        if pa_ds is None:
+            raise RuntimeError("Formato arrow requer pyarrow instalado")
+        con.register("consolidado_arrow", pa_ds.dataset([str(p) for p in files], format="ipc"))
+        scan = "consolidado_arrow"
+        inteiro = centavos = "CAST({0} AS BIGINT)"
+    else:
+        raise ValueError(f"Formato intermediário desconhecido: {files[0]}")
+
+    colunas = [
+        f"{(centavos if c == 'ValorDespesas' else inteiro).format(c)} AS {c}"
+        for c in COLUNAS_CONSOLIDADO
+    ]
+    filtro = f"WHERE {inteiro.format('Ano')} IN ({', '.join(str(int(a)) for a in anos)})" if anos else ""
+    con.execute(f"""
+        CREATE VIEW consolidado AS
+        SELECT row_number() OVER () AS linha, {', '.join(colunas)} FROM {scan} {filtro}
+    """)
+
+
+def _operadoras(registry: OperadoraRegistry) -> pd.DataFrame:
+    """
+    Uma linha por operadora com os atributos do enriquecimento, os valores
+    já validados e uma coluna booleana por regra. As regras de coluna da
+    operadora são avaliadas uma vez por operadora, não por despesa; a
+    última linha (RegistroANS nulo) representa as despesas sem cadastro.
+    """
+    pos = np.append(np.arange(len(registry)), -1)
+    ops = pd.DataFrame({
+        "RegistroANS": pd.array(np.append(registry.keys, 0), dtype="Int64"),
+        **{coluna: registry.take(nome, pos) for coluna, nome in COLUNAS_OPERADORA.items()},
+    })
+    ops.loc[len(ops) - 1, "RegistroANS"] = pd.NA
+
+    regras = [r for r in VALIDATION_RULES if r.column in COLUNAS_OPERADORA]
+    validadas = Validator(regras).apply(ops, reasons_column="motivos")
+    motivos = validadas["motivos"].str.split(",")
+
+    out = ops.rename(columns={c: f"{c}_enriquecido" for c in COLUNAS_OPERADORA})
+    for c in COLUNAS_OPERADORA:
+        out[f"{c}_validado"] = validadas[c]
+    for regra in regras:
+        out[f"valido_{regra.name}"] = [regra.name not in m for m in motivos]
+    return out
+
+
+def _row_rule_sql(rule) -> Dict[str, str]:
+    # regras por linha (colunas do consolidado) expressas em SQL
+    if rule.check != "positivo":
+        raise ValueError(f"Verificação sem equivalente no motor duckdb: {rule.check} ({rule.name})")
+    return {
+        "valido": f"coalesce(c.{rule.column} > 0, false)",
+        "valor": f"CASE WHEN c.{rule.column} > 0 THEN c.{rule.column} END",
+    }
+
+
+def _create_validado(con):
+    """
+    View com o consolidado enriquecido e validado lado a lado: um LEFT JOIN
+    com as operadoras (a linha "sem cadastro" cobre os registros ausentes)
+    e as regras por linha em SQL. MOTIVOS_INVALIDACAO segue a ordem de
+    VALIDATION_RULES, como no motor pandas.
+    """
+    validos, motivos = {}, []
+    valores = {c: f"c.{c}" for c in COLUNAS_CONSOLIDADO}
+    for regra in VALIDATION_RULES:
+        if regra.column in COLUNAS_OPERADORA:
+            validos[regra.name] = f"coalesce(o.valido_{regra.name}, a.valido_{regra.name})"
+        else:
+            sql = _row_rule_sql(regra)
+            validos[regra.name] = sql["valido"]
+            valores[regra.column] = sql["valor"]
+        motivos.append(f"CASE WHEN NOT {validos[regra.name]} THEN {_quote(regra.name)} END")
+
+    enriquecidas = [f"c.{c} AS \"e_{c}\"" for c in COLUNAS_CONSOLIDADO]
+    enriquecidas += [f"o.{c}_enriquecido AS \"e_{c}\"" for c in COLUNAS_OPERADORA]
+    validadas = [f"{valores[c]} AS \"v_{c}\"" for c in COLUNAS_CONSOLIDADO]
+    validadas += [f"coalesce(o.{c}_validado, a.{c}_validado) AS \"v_{c}\"" for c in COLUNAS_OPERADORA]
+    flags = [f"{sql} AS \"ok_{nome}\"" for nome, sql in validos.items()]
+
+    con.execute(f"""
+        CREATE VIEW validado AS
+        SELECT c.linha, {', '.join(enriquecidas + validadas + flags)},
+               o.RegistroANS IS NULL AS sem_cadastro,
+               concat_ws(',', {', '.join(motivos)}) AS "v_{REASONS_COLUMN}"
+        FROM consolidado c
+        LEFT JOIN (SELECT * FROM operadoras WHERE RegistroANS IS NOT NULL) o
+               ON o.RegistroANS = c.RegistroANS
+        CROSS JOIN (SELECT * FROM operadoras WHERE RegistroANS IS NULL) a
+    """)
+
+
+def _frame(chunk: pd.DataFrame, prefix: str, columns: List[str]) -> pd.DataFrame:
+    df = chunk[[f"{prefix}{c}" for c in columns]]
+    df.columns = columns
+    # mesmos tipos do motor pandas: esquema compacto (schema.py)
+    return apply_schema(df.astype({
+        c: "Int64" if c in COLUNAS_CONSOLIDADO else object for c in columns
+    }))
+
+
+def _write_intermediates(con, enriquecido_path: Optional[Path], validado_path: Optional[Path]):
+    """
+    Grava enriquecido e/ou validado numa única leitura em blocos do
+    resultado, na ordem do consolidado (a ordenação do DuckDB usa disco se
+    preciso)
+    """
+    colunas_e = COLUNAS_CONSOLIDADO + list(COLUNAS_OPERADORA)
+    colunas_v = colunas_e + [REASONS_COLUMN]
+    select = [f'"e_{c}"' for c in colunas_e] + [f'"v_{c}"' for c in colunas_v]
+    result = con.execute(f"SELECT {', '.join(select)} FROM validado ORDER BY linha")
+
+    saidas = [(enriquecido_path, "e_", colunas_e), (validado_path, "v_", colunas_v)]
+    with ExitStack() as stack:
+        writers = [
+            (stack.enter_context(TableWriter(path)), prefixo, colunas)
+            for path, prefixo, colunas in saidas if path is not None
+        ]
+        while True:
+            chunk = result.fetch_df_chunk(CHUNK_VECTORS)
+            if chunk.empty:
+                break
+            for writer, prefixo, colunas in writers:
+                writer.write(_frame(chunk, prefixo, colunas))
+
+
+def _partial_stats(con) -> pd.DataFrame:
+    """
+    Parciais n, soma e m2 por Razão Social e UF numa única leitura do
+    consolidado (agregação do DuckDB, com spill em disco), no formato de
+    scripts/utils/stats.py, mais as contagens de rejeição por regra. O
+    var_samp do DuckDB já é um acumulador de Welford/Chan: m2 = var·(n-1).
+    """
+    chaves = ", ".join(f'"v_{c}"' for c in CHAVES_AGREGACAO)
+    rejeicoes = ", ".join(
+        f'count_if(NOT "ok_{r.name}") AS "rej_{r.name}"' for r in VALIDATION_RULES
+    )
+    return con.execute(f"""
+        SELECT {chaves},
+               count(*) AS linhas,
+               count("v_ValorDespesas") AS n,
+               CAST(coalesce(sum("v_ValorDespesas"), 0) AS BIGINT) AS soma,
+               coalesce(var_samp("v_ValorDespesas") * (count("v_ValorDespesas") - 1), 0) AS m2,
+               count_if(sem_cadastro) AS sem_cadastro,
+               {rejeicoes}
+        FROM validado
+        GROUP BY ALL
+        ORDER BY {chaves}
+    """).fetch_df()
+
+
+@instrumented("etapa2.duckdb", rows=lambda result, *a, **k: (result.attrs.get("linhas"), len(result)))
+def transformar_duckdb(
+    files: List[Path],
+    registry: OperadoraRegistry,
+    enriquecido_path: Optional[Path] = None,
+    validado_path: Optional[Path] = None,
+    anos: Optional[Sequence[int]] = None
+) -> pd.DataFrame:
+    """
+    Enriquecimento, validação e agregação fora da memória: o DuckDB lê as
+    partições do disco, faz o JOIN com o registro de operadoras e agrega,
+    gravando em disco o que não couber. Enriquecido e validado só são
+    gravados quando os caminhos são informados (mesmos arquivos do motor
+    pandas). Retorna o DataFrame agregado.
+    """
+    logger.info("Motor duckdb: enriquecimento, validação e agregação")
+
+    with connect() as con:
+        _create_source(con, files, anos)
+        con.register("operadoras", _operadoras(registry))
+        _create_validado(con)
+
+        if enriquecido_path or validado_path:
+            _write_intermediates(con, enriquecido_path, validado_path)
+
+        stats = _partial_stats(con)
+
+    stats = stats.rename(columns={f"v_{c}": c for c in CHAVES_AGREGACAO})
+    sem_cadastro = int(stats["sem_cadastro"].sum())
+    if sem_cadastro:
+        logger.warning(f"{sem_cadastro} linhas sem operadora correspondente no cadastro")
+    for regra in VALIDATION_RULES:
+        logger.info(f"Validação [{regra.name}]: {int(stats[f'rej_{regra.name}'].sum())} linhas rejeitadas")
+
+    # média a partir da soma exata, como em partial_stats
+    n = stats["n"].to_numpy(dtype=np.int64)
+    soma = stats["soma"].to_numpy(dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = soma / n
+    parcial = stats[CHAVES_AGREGACAO].assign(n=n, soma=soma, media=media, m2=stats["m2"].to_numpy(dtype=float))
+
+    df_agregado = agregar_parciais([parcial])
+    df_agregado.attrs["linhas"] = int(stats["linhas"].sum())
+    return df_agregado
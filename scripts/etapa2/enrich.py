@@ -1,11 +1,42 @@
 import pandas as pd
+from typing import Optional, Tuple
 from scripts.config import logger
+from scripts.utils.metrics import instrumented
+from scripts.utils.registry import OperadoraRegistry
+from scripts.utils.schema import INT_TYPES, report_memory
 
 
+def enriquecer_bloco(df_consolidado: pd.DataFrame, registry: OperadoraRegistry) -> Tuple[pd.DataFrame, int]:
+    """
+    LEFT JOIN de um bloco com o registro: busca vetorizada pelo registro
+    ANS e coleta das colunas por posição, sem merge. Os atributos da
+    operadora saem como dicionário (categóricas): por linha só o código.
+    Retorna o bloco enriquecido e quantas linhas ficaram sem operadora.
+    """
+    registros = pd.to_numeric(df_consolidado["RegistroANS"], errors="coerce").astype(INT_TYPES["RegistroANS"])
+    pos = registry.positions(registros)
+
+    df_final = df_consolidado.assign(
+        RegistroANS=registros,
+        CNPJ=registry.take_category("cnpj", pos),
+        RAZAO_SOCIAL=registry.take_category("razao_social", pos),
+        Modalidade=registry.take_category("modalidade", pos),
+        UF=registry.take_category("uf", pos),
+    )
+    return df_final, int((pos < 0).sum())
+
+
+@instrumented("etapa2.enriquecimento")
 def enriquecer_com_operadoras(
     df_consolidado: pd.DataFrame,
-    df_operadoras: pd.DataFrame
+    df_operadoras: Optional[pd.DataFrame] = None,
+    registry: Optional[OperadoraRegistry] = None
 ) -> pd.DataFrame:
+    """
+    Completa o consolidado com CNPJ, Razão Social, Modalidade e UF da
+    operadora. Usa o registro de operadoras (`registry`) ou, sem ele,
+    monta um em memória a partir de `df_operadoras`.
+    """
 
     logger.info("Iniciando enriquecimento com dados das operadoras")
 
@@ -15,58 +46,26 @@ def enriquecer_com_operadoras(
     if "RegistroANS" not in df_consolidado.columns:
         raise ValueError("Coluna RegistroANS não encontrada no consolidado")
 
-    if "REGISTRO_OPERADORA" not in df_operadoras.columns:
-        raise ValueError("Coluna REGISTRO_OPERADORA não encontrada no cadastro ANS")
+    if registry is None:
+        if df_operadoras is None:
+            raise ValueError("Informe o cadastro de operadoras (df_operadoras ou registry)")
+        if "REGISTRO_OPERADORA" not in df_operadoras.columns:
+            raise ValueError("Coluna REGISTRO_OPERADORA não encontrada no cadastro ANS")
 
-    # ----------------------------
-    # 2. Padronização de tipos
-    # ----------------------------
-    df_consolidado["RegistroANS"] = (
-        df_consolidado["RegistroANS"]
-        .astype(str)
-        .str.strip()
-    )
-
-    df_operadoras["REGISTRO_OPERADORA"] = (
-        df_operadoras["REGISTRO_OPERADORA"]
-        .astype(str)
-        .str.strip()
-    )
+        # ----------------------------
+        # 2. Registro: 1 linha por operadora (menor CNPJ), chave inteira
+        # ----------------------------
+        registry = OperadoraRegistry.from_frame(df_operadoras)
 
     # ----------------------------
-    # 3. Tratar duplicidades no cadastro
-    # Estratégia: manter 1 linha por operadora
+    # 3. Enriquecimento (LEFT JOIN) e padronização final de colunas
     # ----------------------------
-    df_operadoras = (
-        df_operadoras
-        .sort_values("CNPJ")
-        .drop_duplicates(
-            subset="REGISTRO_OPERADORA",
-            keep="first"
-        )
-    )
-
-    # ----------------------------
-    # 4. Enriquecimento (LEFT JOIN)
-    # ----------------------------
-    df_enriquecido = df_consolidado.merge(
-        df_operadoras[
-            ["REGISTRO_OPERADORA", "CNPJ", "Razao_Social", "Modalidade", "UF"]
-        ],
-        how="left",
-        left_on="RegistroANS",
-        right_on="REGISTRO_OPERADORA"
-    )
+    df_final, sem_cadastro = enriquecer_bloco(df_consolidado, registry)
 
-    # ----------------------------
-    # 5. Padronização final de colunas
-    # ----------------------------
-    df_final = (
-        df_enriquecido
-        .rename(columns={"Razao_Social": "RAZAO_SOCIAL"})
-        .drop(columns=["REGISTRO_OPERADORA"])
-    )
+    if sem_cadastro:
+        logger.warning(f"{sem_cadastro} linhas sem operadora correspondente no cadastro")
 
+    report_memory("etapa2.enriquecimento", df_final)
     logger.info("Enriquecimento concluído com sucesso")
 
     return df_final
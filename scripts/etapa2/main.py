@@ -1,80 +1,93 @@
-import pandas as pd
-
-from scripts.config import logger, PROCESSED_DIR
-from scripts.etapa2.download import download_operadoras
-from scripts.etapa2.enrich import enriquecer_com_operadoras
-from scripts.etapa2.validate import validar_dados
-from scripts.etapa2.aggregate import agregar_despesas
-
-
-def main():
-    logger.info("PIPELINE ETAPA 2 INICIADO")
+import argparse
+from typing import List, Optional, Sequence
+
+from scripts.config import logger, PROCESSED_DIR, ETAPA2_ENGINE, ETAPA2_INTERMEDIARIOS, ETAPA2_CHUNK_ROWS
+from scripts.etapa2.download import download_operadoras, OUTPUT_FILE as OPERADORAS_FILE
+from scripts.etapa2.duckdb_backend import disponivel as duckdb_disponivel, transformar_duckdb
+from scripts.etapa2.streaming import transformar_em_blocos
+from scripts.utils.pipeline import Pipeline, Stage
+from scripts.utils.registry import OperadoraRegistry, REGISTRY_DIR
+from scripts.utils.table_io import iter_dataset, list_partitions, table_path
+
+CONSOLIDADO = "consolidado_despesas"
+ENRIQUECIDO = table_path("consolidado_enriquecido")
+VALIDADO = table_path("consolidado_validado")
+AGREGADO = PROCESSED_DIR / "despesas_agregadas.csv"
+MOTORES = ("pandas", "duckdb")
+
+
+def validar_motor(motor: str):
+    """Falha antes de qualquer etapa rodar se o motor não existe ou não está instalado"""
+    if motor not in MOTORES:
+        raise ValueError(f"Motor da Etapa 2 desconhecido: {motor} (opções: {', '.join(MOTORES)})")
+    if motor == "duckdb" and not duckdb_disponivel():
+        raise ValueError("Motor duckdb requer o pacote duckdb instalado (pip install duckdb)")
+
+
+def transformar(
+    anos: Optional[Sequence[int]] = None,
+    operadoras_path=OPERADORAS_FILE,
+    motor: str = ETAPA2_ENGINE,
+    intermediarios: bool = ETAPA2_INTERMEDIARIOS
+):
+    """
+    Enriquecimento, validação e agregação (passos 2 a 6), fundidos numa
+    única passada. O motor pandas percorre o consolidado em blocos; o
+    duckdb lê as partições do disco e grava em disco o que não couber
+    (backfills de vários anos). Só `despesas_agregadas.csv` é gerado, a
+    não ser que `intermediarios` peça o enriquecido e o validado.
+    """
+    validar_motor(motor)
 
     # -------------------------------------------------
-    # 1. Download do cadastro de operadoras (ANS)
+    # 2. Registro de operadoras (chave inteira, memory-map)
+    # refeito só quando o cadastro muda
     # -------------------------------------------------
-    operadoras_path = download_operadoras()
+    registry = OperadoraRegistry.open(operadoras_path)
 
-    # -------------------------------------------------
-    # 2. Leitura do consolidado financeiro (Teste 1.3)
-    # -------------------------------------------------
-    consolidado_path = PROCESSED_DIR / "consolidado_despesas.csv"
-
-    df_consolidado = pd.read_csv(
-        consolidado_path,
-        sep=";",
-        low_memory=False
-    )
+    enriquecido_path, validado_path = (ENRIQUECIDO, VALIDADO) if intermediarios else (None, None)
+    if not intermediarios:
+        # versões antigas não correspondem mais ao agregado desta execução
+        for path in (ENRIQUECIDO, VALIDADO):
+            if path.exists():
+                path.unlink()
+                logger.info(f"Intermediário antigo removido: {path}")
 
     # -------------------------------------------------
-    # 3. Leitura do cadastro de operadoras
+    # 3-5. Leitura do consolidado (Teste 1.3), enriquecimento,
+    # validação e agregação
     # -------------------------------------------------
-    df_operadoras = pd.read_csv(
-        operadoras_path,
-        sep=";",
-        low_memory=False
-    )
+    # as partições são as do arquivo de origem, mas o Ano de cada linha vem
+    # da coluna DATA: o filtro por ano é feito nas linhas, não nas pastas
+    if anos:
+        logger.warning(
+            f"Etapa 2 restrita aos anos {', '.join(map(str, sorted(anos)))}: "
+            f"{AGREGADO.name} será substituído só com esses anos"
+        )
+
+    if motor == "duckdb":
+        df_agregado = transformar_duckdb(
+            list_partitions(CONSOLIDADO), registry, enriquecido_path, validado_path, anos=anos
+        )
+    else:
+        # valores monetários trafegam em centavos inteiros
+        blocos = iter_dataset(
+            CONSOLIDADO,
+            columns=["RegistroANS", "Ano", "Trimestre", "ValorDespesas"],
+            chunksize=ETAPA2_CHUNK_ROWS
+        )
+        if anos:
+            blocos = (bloco[bloco["Ano"].isin(list(anos)).fillna(False)] for bloco in blocos)
+        df_agregado = transformar_em_blocos(blocos, registry, enriquecido_path, validado_path)
+
+    for path in (enriquecido_path, validado_path):
+        if path is not None:
+            logger.info(f"Intermediário salvo em: {path}")
 
     # -------------------------------------------------
-    # 4. Enriquecimento dos dados
-    # (aqui completamos RazaoSocial, RegistroANS, UF...)
+    # 6. Despesas agregadas
     # -------------------------------------------------
-    df_enriquecido = enriquecer_com_operadoras(
-        df_consolidado=df_consolidado,
-        df_operadoras=df_operadoras
-    )
-
-    enriquecido_path = PROCESSED_DIR / "consolidado_enriquecido.csv"
-    df_enriquecido.to_csv(
-        enriquecido_path,
-        index=False,
-        sep=";",
-        encoding="utf-8"
-    )
-
-    logger.info(f"Arquivo enriquecido salvo em: {enriquecido_path}")
-
-    # -------------------------------------------------
-    # 5. Validação dos dados
-    # -------------------------------------------------
-    df_validado = validar_dados(df_enriquecido)
-
-    validado_path = PROCESSED_DIR / "consolidado_validado.csv"
-    df_validado.to_csv(
-        validado_path,
-        index=False,
-        sep=";",
-        encoding="utf-8"
-    )
-
-    logger.info(f"Arquivo validado salvo em: {validado_path}")
-
-    # -------------------------------------------------
-    # 6. Agregação de despesas
-    # -------------------------------------------------
-    df_agregado = agregar_despesas(df_validado)
-
-    agregado_path = PROCESSED_DIR / "despesas_agregadas.csv"
+    agregado_path = AGREGADO
     df_agregado.to_csv(
         agregado_path,
         index=False,
@@ -84,8 +97,60 @@ def main():
 
     logger.info(f"Arquivo agregado salvo em: {agregado_path}")
 
+
+def stages(
+    anos: Optional[Sequence[int]] = None,
+    motor: str = ETAPA2_ENGINE,
+    intermediarios: bool = ETAPA2_INTERMEDIARIOS
+) -> List[Stage]:
+    """Etapas da Etapa 2 com seus artefatos de entrada e saída"""
+    validar_motor(motor)
+    auditoria = [ENRIQUECIDO, VALIDADO] if intermediarios else []
+    return [
+        # -------------------------------------------------
+        # 1. Download do cadastro de operadoras (ANS)
+        # -------------------------------------------------
+        # condicional: sem mudança na ANS o arquivo não é tocado e a etapa
+        # seguinte é pulada (impressão digital das entradas inalterada)
+        Stage("download_operadoras", download_operadoras, outputs=[OPERADORAS_FILE], always=True),
+        Stage(
+            "enriquecimento_validacao_agregacao",
+            lambda: transformar(anos, motor=motor, intermediarios=intermediarios),
+            inputs=[PROCESSED_DIR / CONSOLIDADO, OPERADORAS_FILE],
+            outputs=auditoria + [AGREGADO, REGISTRY_DIR],
+            params={"anos": anos, "intermediarios": intermediarios},
+        ),
+    ]
+
+
+def main(
+    anos: Optional[Sequence[int]] = None,
+    forcar: bool = False,
+    motor: str = ETAPA2_ENGINE,
+    intermediarios: bool = ETAPA2_INTERMEDIARIOS
+):
+    logger.info("PIPELINE ETAPA 2 INICIADO")
+    Pipeline(stages(anos, motor, intermediarios)).run(force=forcar)
     logger.info("PIPELINE ETAPA 2 FINALIZADO COM SUCESSO")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Pipeline da Etapa 2")
+    parser.add_argument(
+        "--anos", type=int, nargs="+",
+        help="considera só as despesas destes anos (coluna Ano); despesas_agregadas.csv é substituído só com eles"
+    )
+    parser.add_argument("--forcar", action="store_true", help="executa todas as etapas, mesmo sem alterações")
+    parser.add_argument("--motor", choices=MOTORES, default=ETAPA2_ENGINE, help="motor de enriquecimento/validação/agregação")
+    parser.add_argument(
+        "--intermediarios",
+        action=argparse.BooleanOptionalAction,
+        default=ETAPA2_INTERMEDIARIOS,
+        help="grava consolidado_enriquecido e consolidado_validado (auditoria); --no-intermediarios desliga"
+    )
+    args = parser.parse_args()
+    try:
+        validar_motor(args.motor)  # inclui o padrão vindo de ETAPA2_ENGINE
+    except ValueError as e:
+        parser.error(str(e))
+    main(args.anos, args.forcar, args.motor, args.intermediarios)
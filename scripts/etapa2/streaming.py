@@ -0,0 +1,64 @@
+import pandas as pd
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, Optional
+from scripts.config import logger
+from scripts.etapa2.aggregate import CHAVES_AGREGACAO, agregar_parciais, estatisticas_parciais
+from scripts.etapa2.enrich import enriquecer_bloco
+from scripts.etapa2.validate import VALIDATION_RULES, registrar_rejeicoes
+from scripts.utils.metrics import instrumented
+from scripts.utils.registry import OperadoraRegistry
+from scripts.utils.schema import MemoryReport
+from scripts.utils.stats import combine_stats
+from scripts.utils.table_io import TableWriter
+from scripts.utils.validation import Validator
+
+
+@instrumented("etapa2.transformacao", rows=lambda result, *a, **k: (result.attrs.get("linhas"), len(result)))
+def transformar_em_blocos(
+    blocos: Iterable[pd.DataFrame],
+    registry: OperadoraRegistry,
+    enriquecido_path: Optional[Path] = None,
+    validado_path: Optional[Path] = None
+) -> pd.DataFrame:
+    """
+    Enriquecimento, validação e agregação fundidos numa única passada sobre
+    os blocos do consolidado: cada bloco é enriquecido, validado e reduzido
+    às parciais da agregação (uma linha por Razão Social e UF), que são
+    combinadas a cada bloco. Só as parciais ficam em memória; enriquecido
+    e validado só são gravados quando os caminhos são informados.
+    """
+    logger.info("Enriquecimento, validação e agregação em blocos")
+
+    validator = Validator(VALIDATION_RULES)
+    memoria = MemoryReport("etapa2.transformacao")
+    parcial = None
+    linhas = sem_cadastro = 0
+
+    with ExitStack() as stack:
+        enriquecido = stack.enter_context(TableWriter(enriquecido_path)) if enriquecido_path else None
+        validado = stack.enter_context(TableWriter(validado_path)) if validado_path else None
+
+        for bloco in blocos:
+            df, ausentes = enriquecer_bloco(bloco, registry)
+            if enriquecido is not None:
+                enriquecido.write(df)
+
+            df = validator.apply(df)
+            memoria.add(df)
+            if validado is not None:
+                validado.write(df)
+
+            atual = estatisticas_parciais(df)
+            parcial = atual if parcial is None else combine_stats([parcial, atual], CHAVES_AGREGACAO)
+            linhas += len(bloco)
+            sem_cadastro += ausentes
+
+    if sem_cadastro:
+        logger.warning(f"{sem_cadastro} linhas sem operadora correspondente no cadastro")
+    registrar_rejeicoes(validator.counts)
+    memoria.log()
+
+    df_agregado = agregar_parciais([parcial] if parcial is not None else [])
+    df_agregado.attrs["linhas"] = linhas
+    return df_agregado
@@ -1,62 +1,43 @@
 import pandas as pd
+from typing import Dict, List
 from scripts.config import logger
+from scripts.utils.metrics import instrumented
+from scripts.utils.schema import report_memory
+from scripts.utils.validation import ColumnRule, Validator
 
-def formatar_cnpj(cnpj: str) -> str:
-    """Formata CNPJ no padrão XX.XXX.XXX/XXXX-XX"""
-    if not cnpj or cnpj in ["INVÁLIDO", "0"]:
-        return "INVÁLIDO"
-    cnpj = "".join(filter(str.isdigit, str(cnpj)))
-    if len(cnpj) != 14:
-        return "INVÁLIDO"
-    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+# Regras da validação (uma por coluna); o nome é o código do motivo
+VALIDATION_RULES: List[ColumnRule] = [
+    # dígitos verificadores e máscara XX.XXX.XXX/XXXX-XX
+    ColumnRule("cnpj_invalido", "CNPJ", "cnpj"),
+    ColumnRule("razao_social_vazia", "RAZAO_SOCIAL", "texto", strip=True),
+    ColumnRule("modalidade_vazia", "Modalidade", "texto"),
+    ColumnRule("uf_vazia", "UF", "texto"),
+    # centavos inteiros: inválido vira <NA> e a coluna continua Int64
+    ColumnRule("valor_nao_positivo", "ValorDespesas", "positivo"),
+]
 
-def validar_cnpj(cnpj: str) -> bool:
-    """Valida CNPJ por dígitos verificadores"""
-    if not cnpj:
-        return False
-    cnpj = "".join(filter(str.isdigit, str(cnpj)))
-    if len(cnpj) != 14 or cnpj == cnpj[0] * 14:
-        return False
 
-    pesos_1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    pesos_2 = [6] + pesos_1
+def registrar_rejeicoes(counts: Dict[str, int]):
+    for regra, rejeitadas in counts.items():
+        logger.info(f"Validação [{regra}]: {rejeitadas} linhas rejeitadas")
 
-    def calc_digito(base, pesos):
-        soma = sum(int(base[i]) * pesos[i] for i in range(len(pesos)))
-        resto = soma % 11
-        return "0" if resto < 2 else str(11 - resto)
-
-    dig1 = calc_digito(cnpj[:12], pesos_1)
-    dig2 = calc_digito(cnpj[:12] + dig1, pesos_2)
-
-    return cnpj[-2:] == dig1 + dig2
 
+@instrumented("etapa2.validacao")
 def validar_dados(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica VALIDATION_RULES de uma vez, coluna a coluna. Textos inválidos
+    viram "INVÁLIDO"; ValorDespesas inválido vira nulo, mantendo o tipo
+    numérico. MOTIVOS_INVALIDACAO lista as regras violadas em cada linha e
+    as rejeições por regra ficam em `df.attrs["rejeicoes"]`.
+    """
     logger.info("Validação de dados iniciada")
 
-    # CNPJ
-    df["CNPJ"] = df["CNPJ"].apply(
-        lambda x: formatar_cnpj(x) if validar_cnpj(x) else "INVÁLIDO"
-    )
-
-    # RAZAO_SOCIAL
-    df["RAZAO_SOCIAL"] = df["RAZAO_SOCIAL"].apply(
-        lambda x: x.strip() if isinstance(x, str) and x.strip() != "" else "INVÁLIDO"
-    )
-
-    # Modalidade e UF
-    df["Modalidade"] = df["Modalidade"].apply(
-        lambda x: x if isinstance(x, str) and x.strip() != "" else "INVÁLIDO"
-    )
-    df["UF"] = df["UF"].apply(
-        lambda x: x if isinstance(x, str) and x.strip() != "" else "INVÁLIDO"
-    )
-
-    # ValorDespesas
-    df["ValorDespesas"] = pd.to_numeric(df["ValorDespesas"], errors="coerce")
-    df["ValorDespesas"] = df["ValorDespesas"].apply(
-        lambda x: x if x > 0 else "INVÁLIDO"
-    )
-
-    logger.info("Validação concluída e arquivo salvo em: consolidado_validado.csv")
+    validator = Validator(VALIDATION_RULES)
+    df = validator.apply(df)
+    df.attrs["rejeicoes"] = dict(validator.counts)
+
+    registrar_rejeicoes(validator.counts)
+
+    report_memory("etapa2.validacao", df)
+    logger.info("Validação concluída")
     return df
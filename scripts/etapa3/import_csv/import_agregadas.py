@@ -2,7 +2,8 @@
 from pathlib import Path
 import csv
 import logging
-from utils import safe_float, sanitize_value
+from scripts.etapa3.utils import safe_decimal, sanitize_value, load_operadoras_index
+from scripts.utils.metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ def is_valid_row(razao_social, total_despesas, media_despesas):
     return True
 
 
+@instrumented("etapa3.importacao_agregadas", rows=lambda total, *a, **kw: (None, total))
 def import_despesas_agregadas(conn, data_dir):
     csv_path = Path(data_dir) / "despesas_agregadas.csv"
     if not csv_path.exists():
@@ -25,6 +27,14 @@ def import_despesas_agregadas(conn, data_dir):
     inserted = 0
     pendentes = 0
 
+    # (razão social, UF) -> id, de uma única consulta (sem SELECT por linha)
+    operadoras = load_operadoras_index(conn)
+    operadora_por_nome = {}
+    for operadora_id, razao, uf_operadora in zip(
+        operadoras.columns["id"], operadoras.columns["razao_social"], operadoras.columns["uf"]
+    ):
+        operadora_por_nome.setdefault((razao, uf_operadora), operadora_id)
+
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f, delimiter=';')
         for row in reader:
@@ -36,27 +46,16 @@ def import_despesas_agregadas(conn, data_dir):
                 if uf == "INVÁLIDO" or uf == "":
                     uf = None
 
-                total_despesas = safe_float(row.get("total_despesas"))
-                media_despesas = safe_float(row.get("media_despesas"))
-                desvio_padrao = safe_float(row.get("desvio_padrao"))
+                total_despesas = safe_decimal(row.get("total_despesas"))
+                media_despesas = safe_decimal(row.get("media_despesas"))
+                desvio_padrao = safe_decimal(row.get("desvio_padrao"))
 
                 cur = conn.cursor()
 
                 if is_valid_row(razao_social, total_despesas, media_despesas):
-                    # tenta buscar a operadora
-                    cur.execute(
-                        """
-                        SELECT id
-                        FROM operadoras
-                        WHERE razao_social = %s
-                          AND uf IS NOT DISTINCT FROM %s
-                        """,
-                        (razao_social, uf)
-                    )
-                    result = cur.fetchone()
-
-                    if result:
-                        operadora_id = result[0]
+                    # tenta encontrar a operadora
+                    operadora_id = operadora_por_nome.get((razao_social, uf))
+                    if operadora_id is not None:
                         # inserir na tabela principal
                         cur.execute(
                             """
@@ -121,3 +120,4 @@ def import_despesas_agregadas(conn, data_dir):
                 continue
 
     logger.info(f"Despesas agregadas: {inserted}, pendentes: {pendentes}")
+    return inserted + pendentes
@@ -1,11 +1,16 @@
 # import_consolidadas.py
 from pathlib import Path
+from itertools import islice
 import csv
 import logging
-from utils import safe_float, safe_int
+from scripts.etapa3.utils import safe_decimal, safe_int, load_operadoras_index
+from scripts.utils.metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
+BATCH_SIZE = 10_000
+
+@instrumented("etapa3.importacao_consolidadas", rows=lambda total, *a, **kw: (None, total))
 def import_despesas_consolidadas(conn, data_dir):
     csv_path = Path(data_dir) / "consolidado_despesas.csv"
     if not csv_path.exists():
@@ -15,45 +20,52 @@ def import_despesas_consolidadas(conn, data_dir):
     inserted = 0
     pendentes = 0
 
+    # operadora_id resolvido em memória, em lote (sem SELECT por linha)
+    operadoras = load_operadoras_index(conn)
+
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f, delimiter=';')
-        for row in reader:
-            try:
-                registro_ans = safe_int(row.get("RegistroANS"))
-                ano = safe_int(row.get("Ano"))
-                trimestre = safe_int(row.get("Trimestre"))
-                valor_despesas = safe_float(row.get("ValorDespesas"))
-
-                cur = conn.cursor()
-                cur.execute("SELECT id FROM operadoras WHERE registro_operadora = %s", (registro_ans,))
-                result = cur.fetchone()
-                if result:
-                    operadora_id = result[0]
-                    cur.execute(
-                        """
-                        INSERT INTO despesas_consolidadas(
-                            operadora_id, registro_ans, ano, trimestre, valor_despesas
-                        ) VALUES (%s, %s, %s, %s, %s)
-                        """,
-                        (operadora_id, registro_ans, ano, trimestre, valor_despesas)
-                    )
-                    inserted += 1
-                else:
-                    cur.execute(
-                        """
-                        INSERT INTO despesas_consolidadas_pendentes(
-                            registro_ans, ano, trimestre, valor_despesas
-                        ) VALUES (%s, %s, %s, %s)
-                        """,
-                        (registro_ans, ano, trimestre, valor_despesas)
-                    )
-                    pendentes += 1
-
-                conn.commit()
-                cur.close()
-            except Exception as e:
-                logger.error(f"Erro ao importar linha {row}: {e}")
-                conn.rollback()
-                continue
+        while True:
+            batch = list(islice(reader, BATCH_SIZE))
+            if not batch:
+                break
+            registros = [safe_int(row.get("RegistroANS")) for row in batch]
+            operadora_ids = operadoras.take("id", operadoras.positions(registros))
+
+            for row, registro_ans, operadora_id in zip(batch, registros, operadora_ids):
+                try:
+                    ano = safe_int(row.get("Ano"))
+                    trimestre = safe_int(row.get("Trimestre"))
+                    valor_despesas = safe_decimal(row.get("ValorDespesas"))
+
+                    cur = conn.cursor()
+                    if operadora_id is not None:
+                        cur.execute(
+                            """
+                            INSERT INTO despesas_consolidadas(
+                                operadora_id, registro_ans, ano, trimestre, valor_despesas
+                            ) VALUES (%s, %s, %s, %s, %s)
+                            """,
+                            (operadora_id, registro_ans, ano, trimestre, valor_despesas)
+                        )
+                        inserted += 1
+                    else:
+                        cur.execute(
+                            """
+                            INSERT INTO despesas_consolidadas_pendentes(
+                                registro_ans, ano, trimestre, valor_despesas
+                            ) VALUES (%s, %s, %s, %s)
+                            """,
+                            (registro_ans, ano, trimestre, valor_despesas)
+                        )
+                        pendentes += 1
+
+                    conn.commit()
+                    cur.close()
+                except Exception as e:
+                    logger.error(f"Erro ao importar linha {row}: {e}")
+                    conn.rollback()
+                    continue
 
     logger.info(f"Despesas consolidadas: {inserted}, pendentes: {pendentes}")
+    return inserted + pendentes
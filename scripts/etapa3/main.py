@@ -1,8 +1,8 @@
-from scripts.config import logger
-from pathlib import Path
+from scripts.config import logger, RAW_DIR, PROCESSED_DIR
+from scripts.utils.pipeline import Pipeline, Stage
+import argparse
 import os
 from dotenv import load_dotenv
-import psycopg2
 
 from scripts.etapa3.import_csv.import_operadoras import import_operadoras
 from scripts.etapa3.import_csv.import_consolidadas import import_despesas_consolidadas
@@ -20,19 +20,22 @@ from scripts.etapa3.analysis.query3_acima_media import run_query as query_acima_
 # ---------------------------
 load_dotenv()
 DB_HOST = os.getenv("DB_HOST")
-DB_PORT = int(os.getenv("DB_PORT"))
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
-DATA_DIR = os.getenv("DATA_DIR")
 
-raw_dir = Path(DATA_DIR) / "raw"
-processed_dir = Path(DATA_DIR) / "processed"
+# mesmos caminhos (absolutos) das saídas das Etapas 1 e 2: é por eles que
+# o Pipeline liga a importação às etapas que produzem os CSVs
+raw_dir = RAW_DIR
+processed_dir = PROCESSED_DIR
 
 # ---------------------------
 # Conexão
 # ---------------------------
 def connect_db():
+    # driver importado só ao conectar: montar o grafo de etapas não exige o banco
+    import psycopg2
     try:
         conn = psycopg2.connect(
             host=DB_HOST,
@@ -77,18 +80,48 @@ def run_analytics(conn):
     query_acima_media(conn)
 
 # ---------------------------
-# Main
+# Etapas
 # ---------------------------
-def main():
-    logger.info("Pipeline Etapa 3 iniciado")
+def importar():
     conn = connect_db()
-
     try:
         run_imports(conn)
+    finally:
+        conn.close()
+        logger.info("Conexão com o banco encerrada")
+
+def analisar():
+    conn = connect_db()
+    try:
         run_analytics(conn)
     finally:
         conn.close()
         logger.info("Conexão com o banco encerrada")
 
+def stages():
+    # a importação só é refeita quando algum CSV de entrada muda
+    # (use --forcar após recriar o banco)
+    return [
+        Stage(
+            "importacao_banco",
+            importar,
+            inputs=[
+                raw_dir / "operadoras_ativas.csv",
+                processed_dir / "consolidado_despesas.csv",
+                processed_dir / "despesas_agregadas.csv",
+            ],
+        ),
+        Stage("analises", analisar, after=["importacao_banco"], always=True),
+    ]
+
+# ---------------------------
+# Main
+# ---------------------------
+def main(forcar: bool = False):
+    logger.info("Pipeline Etapa 3 iniciado")
+    Pipeline(stages()).run(force=forcar)
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Pipeline da Etapa 3")
+    parser.add_argument("--forcar", action="store_true", help="reimporta mesmo sem alterações nos CSVs")
+    main(parser.parse_args().forcar)
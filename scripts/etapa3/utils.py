@@ -1,5 +1,7 @@
 import logging
-import re
+from decimal import Decimal, InvalidOperation
+import numpy as np
+from scripts.utils.registry import KeyIndex
 
 logger = logging.getLogger(__name__)
 
@@ -13,13 +15,6 @@ def sanitize_value(value, max_len):
         logger.warning(f"Valor truncado: '{value}' -> '{value[:max_len]}'")
     return value[:max_len]
 
-def is_valid_cnpj(cnpj):
-    """Valida formato do CNPJ: apenas números e 14 dígitos"""
-    if cnpj is None:
-        return False
-    cnpj = re.sub(r'\D', '', str(cnpj))
-    return len(cnpj) == 14
-
 def safe_int(value):
     try:
         if value is None or value == '':
@@ -34,4 +29,30 @@ def safe_float(value):
             return None
         return float(value)
     except ValueError:
-        return None
\ No newline at end of file
+        return None
+
+def safe_decimal(value):
+    """Valor monetário exato para colunas NUMERIC(20,2) (sem passar por float)"""
+    try:
+        if value is None or value == '':
+            return None
+        value = Decimal(str(value).strip())
+        if not value.is_finite():
+            return None
+        return value.quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+def load_operadoras_index(conn):
+    """
+    Operadoras já gravadas no banco (registro -> id, razão social, UF),
+    numa única consulta: os importadores resolvem as chaves estrangeiras
+    em memória em vez de um SELECT por linha.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT registro_operadora, id, razao_social, uf FROM operadoras")
+    rows = cur.fetchall()
+    cur.close()
+    return KeyIndex(
+        np.array([r[0] for r in rows], dtype=np.int64),
+        {name: np.array([r[i] for r in rows], dtype=object) for i, name in enumerate(["id", "razao_social", "uf"], 1)}
+    )
@@ -0,0 +1,53 @@
+import argparse
+from typing import List, Optional, Sequence
+from scripts.config import logger, ETAPA2_ENGINE
+from scripts.etapa1.main import stages as stages_etapa1, parse_anos
+from scripts.etapa2.main import stages as stages_etapa2, validar_motor
+from scripts.utils.pipeline import Pipeline, Stage
+
+
+def stages(
+    etapas: Sequence[int] = (1, 2),
+    ano_inicial: Optional[int] = None,
+    ano_final: Optional[int] = None
+) -> List[Stage]:
+    """
+    Junta as etapas das Etapas pedidas num único grafo: o download do
+    cadastro de operadoras, por exemplo, roda junto com o processamento
+    da Etapa 1.
+    """
+    anos = parse_anos(ano_inicial, ano_final)
+    selected: List[Stage] = []
+    if 1 in etapas:
+        selected += stages_etapa1(anos)
+    if 2 in etapas:
+        selected += stages_etapa2(list(range(anos[0], anos[1] + 1)) if anos else None)
+    if 3 in etapas:
+        # importado só quando pedido: depende do banco (psycopg2 e variáveis DB_*)
+        from scripts.etapa3.main import stages as stages_etapa3
+        selected += stages_etapa3()
+    return selected
+
+
+def main(etapas: Sequence[int] = (1, 2), ano_inicial: int = None, ano_final: int = None, forcar: bool = False):
+    logger.info(f"PIPELINE INICIADO (etapas {', '.join(map(str, etapas))})")
+    executadas = Pipeline(stages(etapas, ano_inicial, ano_final)).run(force=forcar)
+    puladas = [name for name, ran in executadas.items() if not ran]
+    if puladas:
+        logger.info(f"Etapas sem alterações (reaproveitadas): {', '.join(puladas)}")
+    logger.info("PIPELINE FINALIZADO COM SUCESSO")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline completo (Etapas 1, 2 e 3)")
+    parser.add_argument("--etapas", type=int, nargs="+", default=[1, 2], choices=[1, 2, 3])
+    parser.add_argument("--ano-inicial", type=int, help="backfill: primeiro ano a baixar")
+    parser.add_argument("--ano-final", type=int, help="backfill: último ano a baixar")
+    parser.add_argument("--forcar", action="store_true", help="executa todas as etapas, mesmo sem alterações")
+    args = parser.parse_args()
+    if 2 in args.etapas:
+        try:
+            validar_motor(ETAPA2_ENGINE)
+        except ValueError as e:
+            parser.error(str(e))
+    main(args.etapas, args.ano_inicial, args.ano_final, args.forcar)
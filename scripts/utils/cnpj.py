@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+INVALIDO = "INVÁLIDO"
+
+PESOS_1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+# XX.XXX.XXX/XXXX-XX: posição de cada dígito e dos separadores na máscara
+MASCARA = "00.000.000/0000-00"
+POSICOES_DIGITOS = np.array([i for i, c in enumerate(MASCARA) if c == "0"])
+POSICOES_SEPARADORES = np.array([i for i, c in enumerate(MASCARA) if c != "0"])
+SEPARADORES = np.array([ord(c) for c in MASCARA if c != "0"], dtype=np.uint32)
+
+
+def _as_text(values) -> np.ndarray:
+    # nulos não têm dígitos: viram texto vazio; números passam por str() como antes
+    series = pd.Series(values, dtype=object)
+    text = series.where(series.notna(), "").astype(str).to_numpy(dtype=str)
+    return text if len(text) else np.array([], dtype="<U1")
+
+
+def cnpj_digits(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dígitos dos CNPJs de uma coluna inteira, sem laço por linha: o texto
+    vira uma matriz de code points (n x largura), os dígitos de cada linha
+    são compactados à esquerda (argsort estável) e os 14 primeiros
+    retornados como inteiros. Retorna (dígitos n x 14, tem_14_digitos).
+    """
+    text = _as_text(values)
+    n = len(text)
+    width = max(text.dtype.itemsize // 4, 14)
+    codes = np.zeros((n, width), dtype=np.uint32)
+    if n:
+        codes[:, :text.dtype.itemsize // 4] = text.view(np.uint32).reshape(n, -1)
+
+    is_digit = (codes >= 48) & (codes <= 57)
+    count = is_digit.sum(axis=1)
+    order = np.argsort(~is_digit, axis=1, kind="stable")
+    digits = np.take_along_axis(codes, order[:, :14], axis=1).astype(np.int64) - 48
+    digits[np.arange(14) >= count[:, None]] = 0
+    return digits, count == 14
+
+
+def _valid(digits: np.ndarray, has_14: np.ndarray) -> np.ndarray:
+    d1 = (digits[:, :12] @ PESOS_1) % 11
+    d1 = np.where(d1 < 2, 0, 11 - d1)
+    d2 = (np.column_stack([digits[:, :12], d1]) @ PESOS_2) % 11
+    d2 = np.where(d2 < 2, 0, 11 - d2)
+    repetido = (digits == digits[:, :1]).all(axis=1)
+    return has_14 & ~repetido & (digits[:, 12] == d1) & (digits[:, 13] == d2)
+
+
+def validate_cnpj(values) -> np.ndarray:
+    """Máscara booleana: CNPJ com 14 dígitos, não repetidos, e dígitos verificadores corretos"""
+    return _valid(*cnpj_digits(values))
+
+
+def format_digits(digits: np.ndarray) -> np.ndarray:
+    """Matriz de dígitos (n x 14) -> textos XX.XXX.XXX/XXXX-XX"""
+    out = np.empty((len(digits), len(MASCARA)), dtype=np.uint32)
+    out[:, POSICOES_DIGITOS] = digits + 48
+    out[:, POSICOES_SEPARADORES] = SEPARADORES
+    return out.view(f"<U{len(MASCARA)}").ravel()
+
+
+def check_cnpj(values, invalid: str = INVALIDO) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valida e formata uma coluna de CNPJs numa única passada.
+    Retorna (válidos, formatados), com `invalid` no lugar dos inválidos.
+    """
+    digits, has_14 = cnpj_digits(values)
+    valid = _valid(digits, has_14)
+    formatted = format_digits(digits).astype(object)
+    formatted[~valid] = invalid
+    return valid, formatted
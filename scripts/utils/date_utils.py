@@ -1,29 +1,72 @@
 from pathlib import Path
 import re
+import numpy as np
 import pandas as pd
-from typing import Tuple, Optional
+from typing import Optional, Tuple
 
-def extract_year_quarter(file: Path, df: Optional[pd.DataFrame] = None) -> Tuple[Optional[int], Optional[int]]:
+QUARTER_RE = re.compile(r"([1-4])T(20\d{2})")
+
+# formatos vistos na coluna DATA (CSV da ANS e células de data do XLSX)
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S"]
+
+
+def period_from_filename(file: Path) -> Tuple[Optional[int], Optional[int]]:
+    """Ano e trimestre pelo nome do arquivo (ex: 1T2025.csv -> (2025, 1))"""
+    m = QUARTER_RE.search(file.name.upper())
+    if m:
+        return int(m.group(2)), int(m.group(1))
+    return None, None
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Converte datas em texto tentando cada formato de DATE_FORMATS; o resto vira NaT"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    text = values.astype(object).where(values.notna(), None).astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+    return parsed
+
+
+def derive_periods(
+    file: Path,
+    data: Optional[pd.Series] = None,
+    index: Optional[pd.Index] = None
+) -> Tuple[pd.Series, pd.Series]:
     """
-    Prioridade:
-    1️⃣ Nome do arquivo (ex: 1T2025.csv)
-    2️⃣ Coluna DATA
+    Ano e trimestre de cada linha (Int64). A coluna DATA tem poucos valores
+    distintos: cada um é convertido uma única vez e o resultado é espalhado
+    para as linhas pelos códigos do factorize. Linhas sem DATA válida usam
+    o período do nome do arquivo (sem DATA, todas usam; `index` dá as linhas).
     """
+    ano_arquivo, trimestre_arquivo = period_from_filename(file)
 
-    # 1️⃣ Nome do arquivo → 1T2025.csv
-    name = file.name.upper()
-    m = re.search(r"([1-4])T(20\d{2})", name)
-    if m:
-        trimestre = int(m.group(1))
-        ano = int(m.group(2))
-        return ano, trimestre
-
-    # 2️⃣ Coluna DATA (fallback)
-    if df is not None and "DATA" in df.columns:
-        if not df["DATA"].isna().all():
-            data_col = df["DATA"].dropna()
-            ano = data_col.dt.year.iloc[0]
-            trimestre = data_col.dt.quarter.iloc[0]
-            return ano, trimestre
+    if data is None:
+        index = index if index is not None else pd.RangeIndex(0)
+        ano = np.full(len(index), np.nan if ano_arquivo is None else ano_arquivo, dtype=float)
+        trimestre = np.full(len(index), np.nan if trimestre_arquivo is None else trimestre_arquivo, dtype=float)
+    else:
+        index = data.index
+        codes, uniques = pd.factorize(data)
+        dates = parse_dates(pd.Series(uniques))
 
-    return None, None
+        # posição extra no fim para códigos -1 (valor nulo)
+        anos_unicos = np.append(dates.dt.year.to_numpy(dtype=float), np.nan)
+        trimestres_unicos = np.append(dates.dt.quarter.to_numpy(dtype=float), np.nan)
+        ano = anos_unicos[codes]
+        trimestre = trimestres_unicos[codes]
+
+        sem_data = np.isnan(ano)
+        if ano_arquivo is not None:
+            ano[sem_data] = ano_arquivo
+            trimestre[sem_data] = trimestre_arquivo
+
+    return (
+        pd.Series(pd.array(ano, dtype="Int64"), index=index),
+        pd.Series(pd.array(trimestre, dtype="Int64"), index=index),
+    )
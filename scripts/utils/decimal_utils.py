@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+from scripts.config import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow é opcional
+    pa = None
+    pc = None
+
+MAX_DIGITS = 18  # dígitos lidos: o valor sem escala cabe em int64
+MAX_INTEGER_DIGITS = 16  # parte inteira: em centavos (x100) ainda cabe em int64
+
+_fallback_warned = False
+
+_ZERO, _NINE, _MINUS, _SPACE, _QUOTE = ord("0"), ord("9"), ord("-"), ord(" "), ord('"')
+
+
+def _byte_matrix(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bytes da coluna como matriz (linhas x largura máxima), sem cópia por
+    valor em Python quando há pyarrow: o padding é feito pelo Arrow e o
+    buffer resultante é reinterpretado direto pelo NumPy.
+    Valores nulos ou não ASCII viram linha vazia e são marcados em `bad`.
+    """
+    if pa is not None:
+        try:
+            arr = pa.array(series, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arr = pa.array(series.astype(str).where(series.notna(), None), type=pa.string())
+
+        bad = pc.or_(
+            arr.is_null(),
+            pc.not_equal(pc.binary_length(arr), pc.utf8_length(arr))
+        ).fill_null(True)
+        arr = pc.if_else(bad, "", arr)
+        width = max(pc.max(pc.binary_length(arr)).as_py() or 0, 1)
+        padded = pc.utf8_rpad(arr, width=width, padding=" ")
+        if isinstance(padded, pa.ChunkedArray):
+            padded = padded.combine_chunks()
+
+        _, offsets_buf, data_buf = padded.buffers()
+        start = np.frombuffer(offsets_buf, dtype=np.int32)[padded.offset]
+        data = np.frombuffer(data_buf, dtype=np.uint8)[start:start + len(padded) * width]
+        return data.reshape(len(padded), width), bad.to_numpy(zero_copy_only=False)
+
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        logger.warning("pyarrow não instalado: valores monetários convertidos valor a valor (lento); instale o pyarrow")
+
+    bad = series.isna().to_numpy().copy()
+    encoded = []
+    for i, value in enumerate(series.tolist()):
+        try:
+            encoded.append(b"" if bad[i] else str(value).encode("ascii"))
+        except UnicodeEncodeError:
+            bad[i] = True
+            encoded.append(b"")
+    width = max(max(map(len, encoded), default=0), 1)
+    matrix = np.frombuffer(np.array(encoded, dtype=f"S{width}").tobytes(), dtype=np.uint8)
+    return matrix.reshape(len(encoded), width), bad
+
+
+def parse_cents(series: pd.Series, decimal: str = ",", thousands: str = ".") -> pd.Series:
+    """
+    Converte texto monetário em centavos inteiros (Int64), de forma
+    vetorizada sobre os bytes: "1.234.567,89" -> 123456789.
+    Aceita sinal "-" à esquerda, espaços e aspas nas bordas; com mais de 2
+    casas decimais arredonda meio para cima. Valores inválidos (inclusive
+    os que estourariam o int64) viram <NA>.
+    """
+    n = len(series)
+    if n == 0:
+        return pd.Series(pd.array([], dtype="Int64"), index=series.index)
+
+    matrix, bad = _byte_matrix(series)
+    # layout coluna-maior: cada posição de caractere vira um vetor contíguo
+    columns = np.ascontiguousarray(matrix.T)
+
+    digits = columns - np.uint8(_ZERO)  # bytes fora de 0-9 estouram para > 9
+    is_digit = digits <= 9
+    is_dec = columns == ord(decimal)
+    is_minus = columns == _MINUS
+    is_content = is_digit | is_dec
+    if thousands:
+        is_content |= columns == ord(thousands)
+    is_known = is_content | is_minus | (columns == _SPACE) | (columns == _QUOTE) | (columns == 0)
+
+    n_digits = is_digit.sum(axis=0)
+    n_minus = is_minus.sum(axis=0)
+    # Horner posição a posição: cada passo processa todas as linhas de uma vez
+    value = np.zeros(n, dtype=np.int64)
+    frac = np.zeros(n, dtype=np.int64)
+    after_dec = np.zeros(n, dtype=bool)
+    seen = np.zeros(n, dtype=bool)
+    late_minus = np.zeros(n, dtype=bool)
+    for digit, digit_value, dec, minus, content in zip(is_digit, digits, is_dec, is_minus, is_content):
+        value *= np.where(digit, 10, 1)
+        value += np.where(digit, digit_value, 0)
+        frac += digit & after_dec
+        after_dec |= dec
+        late_minus |= minus & seen  # "-" depois de dígitos/separadores ("12-3")
+        seen |= content
+
+    invalid = (
+        bad
+        | (n_digits == 0)
+        | (n_digits > MAX_DIGITS)
+        | (n_digits - frac > MAX_INTEGER_DIGITS)
+        | (is_dec.sum(axis=0) > 1)
+        | (n_minus > 1)
+        | late_minus
+        | ~is_known.all(axis=0)
+    )
+
+    scale_up = 10 ** np.clip(2 - frac, 0, 2)
+    divisor = 10 ** np.clip(frac - 2, 0, MAX_DIGITS)
+    cents = np.where(
+        frac <= 2,
+        value * scale_up,
+        value // divisor + (2 * (value % divisor) >= divisor)
+    )
+    cents = np.where(n_minus > 0, -cents, cents)
+    cents[invalid] = 0
+
+    return pd.Series(pd.arrays.IntegerArray(cents, invalid), index=series.index)
+
+
+def parse_brl_cents(series: pd.Series) -> pd.Series:
+    """Formato brasileiro das planilhas da ANS: "1.234,56" """
+    return parse_cents(series, decimal=",", thousands=".")
+
+
+def parse_decimal_cents(series: pd.Series) -> pd.Series:
+    """Formato dos CSVs gerados pelo pipeline: "1234.56" """
+    return parse_cents(series, decimal=".", thousands="")
+
+
+def format_cents(cents: pd.Series) -> pd.Series:
+    """Centavos -> texto decimal exato com 2 casas ("-1234.05"); <NA> permanece vazio"""
+    cents = pd.Series(cents, copy=False).astype("Int64")
+    absolute = cents.abs()
+    sign = pd.Series(np.where(cents.fillna(0).to_numpy() < 0, "-", ""), index=cents.index)
+    text = (
+        sign
+        + (absolute // 100).astype(str)
+        + "."
+        + (absolute % 100).astype(str).str.zfill(2)
+    )
+    return text.where(cents.notna(), None)
+
+
+def cents_to_decimal(values: pd.Series) -> pd.Series:
+    """Versão tolerante de format_cents para colunas mistas (ex: centavos + "INVÁLIDO")"""
+    numeric = pd.to_numeric(values, errors="coerce")
+    formatted = format_cents(numeric.round().astype("Int64"))
+    return formatted.where(numeric.notna(), values)
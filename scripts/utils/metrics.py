@@ -0,0 +1,289 @@
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from scripts.config import logger, LOG_DIR
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage
+    resource = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+HISTORY_FILE = LOG_DIR / "historico_execucoes.jsonl"
+# uma execução = um processo; RUN_ID permite agrupar processos de uma mesma rodada
+RUN_ID = os.getenv("RUN_ID") or f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+_lock = threading.Lock()
+# medições em andamento neste processo (protegido por _lock)
+_active = set()
+
+
+def _reset_peak_rss():
+    # Linux: zera o VmHWM do processo para medir o pico só desta etapa
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+def _children_peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def _cpu_seconds() -> float:
+    # inclui workers do ProcessPoolExecutor já encerrados
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class Measurement:
+    """
+    Mede uma etapa: tempo de parede, CPU (processo + filhos), pico de RSS
+    e linhas de entrada/saída. Ao sair, grava um registro JSON em
+    HISTORY_FILE. Etapas rodando ao mesmo tempo no mesmo processo dividem
+    CPU e RSS: o pico só é zerado quando nenhuma outra medição está aberta,
+    e as que se sobrepõem saem com `concorrente: true` (RSS não comparável).
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.concurrent = False
+
+    def __enter__(self):
+        with _lock:
+            if _active:
+                self.concurrent = True
+                for other in _active:
+                    other.concurrent = True
+            else:
+                _reset_peak_rss()
+            _active.add(self)
+        self._started_at = datetime.now()
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_seconds()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        with _lock:
+            _active.discard(self)
+        rows = self.rows_out if self.rows_out is not None else self.rows_in
+        record = {
+            "execucao": RUN_ID,
+            "etapa": self.stage,
+            "inicio": self._started_at.isoformat(timespec="seconds"),
+            "status": "ok" if exc_type is None else "erro",
+            "tempo_s": round(wall, 4),
+            "cpu_s": round(_cpu_seconds() - self._cpu, 4),
+            "pico_rss_mb": _round(_peak_rss_mb()),
+            "pico_rss_filhos_mb": _round(_children_peak_rss_mb()),
+            "linhas_entrada": self.rows_in,
+            "linhas_saida": self.rows_out,
+            # sem linhas (ex: nada a reprocessar) a vazão não é comparável
+            "linhas_por_s": round(rows / wall, 1) if rows and wall > 0 else None,
+            "concorrente": self.concurrent,
+        }
+        record_run(record)
+        logger.info(
+            f"[métricas] {self.stage}: {record['tempo_s']:.2f}s, CPU {record['cpu_s']:.2f}s, "
+            f"pico RSS {record['pico_rss_mb']} MB, linhas {self.rows_in} -> {self.rows_out}"
+        )
+        return False
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def record_run(record: dict, path: Path = HISTORY_FILE):
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _count(value) -> Optional[int]:
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    return None
+
+
+def instrumented(stage: str, rows: Optional[Callable[..., Tuple[Optional[int], Optional[int]]]] = None):
+    """
+    Decorador que mede a função como a etapa `stage`. Por padrão as linhas
+    de entrada são as do primeiro DataFrame recebido e as de saída vêm do
+    retorno (DataFrame ou int); `rows(resultado, *args, **kwargs)` pode
+    devolver (entrada, saída) explicitamente.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Measurement(stage) as m:
+                if rows is None:
+                    frames = [a for a in (*args, *kwargs.values()) if pd is not None and isinstance(a, pd.DataFrame)]
+                    m.rows_in = len(frames[0]) if frames else None
+                result = fn(*args, **kwargs)
+                if rows is None:
+                    m.rows_out = _count(result)
+                else:
+                    m.rows_in, m.rows_out = rows(result, *args, **kwargs)
+            return result
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Histórico e comparação
+# ---------------------------------------------------------------------------
+
+def load_history(path: Path = HISTORY_FILE) -> List[dict]:
+    if not path.exists():
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def runs(records: List[dict]) -> List[str]:
+    """Execuções na ordem em que aparecem no histórico"""
+    return list(dict.fromkeys(r["execucao"] for r in records))
+
+
+def by_stage(records: List[dict], run_id: str) -> Dict[str, dict]:
+    # se a etapa rodou mais de uma vez na execução, vale a última
+    return {r["etapa"]: r for r in records if r["execucao"] == run_id and r.get("status") == "ok"}
+
+
+# métrica -> True se maior é pior
+METRICS = {"tempo_s": True, "cpu_s": True, "pico_rss_mb": True, "linhas_por_s": False}
+
+
+def compare(
+    current: Dict[str, dict],
+    baseline: Dict[str, dict],
+    tolerance: float = 0.2,
+    min_seconds: float = 1.0
+) -> List[dict]:
+    """
+    Compara etapa a etapa. Uma métrica é regressão quando piora mais que
+    `tolerance` (fração); em etapas que duram menos de `min_seconds` nas
+    duas execuções, tempo e vazão são só informativos (ruído). O pico de
+    RSS de registros concorrentes (pico do processo todo) é ignorado.
+    """
+    rows = []
+    for stage in sorted(current.keys() & baseline.keys()):
+        short = max(current[stage]["tempo_s"], baseline[stage]["tempo_s"]) < min_seconds
+        concurrent = current[stage].get("concorrente") or baseline[stage].get("concorrente")
+        for metric, higher_is_worse in METRICS.items():
+            if concurrent and metric == "pico_rss_mb":
+                continue
+            new, old = current[stage].get(metric), baseline[stage].get(metric)
+            if new is None or old is None or old == 0:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            if short and metric != "pico_rss_mb":
+                worse = False
+            rows.append({
+                "etapa": stage, "metrica": metric, "base": old, "atual": new,
+                "variacao": change, "regressao": worse
+            })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Histórico de desempenho do pipeline")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    sub.add_parser("listar", help="lista as execuções registradas")
+
+    cmp = sub.add_parser("comparar", help="compara uma execução com uma base e aponta regressões")
+    cmp.add_argument("--execucao", help="execução avaliada (padrão: a mais recente)")
+    cmp.add_argument("--base", help="execução de referência (padrão: a anterior à avaliada)")
+    cmp.add_argument("--tolerancia", type=float, default=0.2, help="piora aceita, em fração (padrão 0.2)")
+    cmp.add_argument("--minimo-s", type=float, default=1.0, help="ignora tempos abaixo disto (padrão 1s)")
+    cmp.add_argument("--historico", type=Path, default=HISTORY_FILE)
+
+    args = parser.parse_args(argv)
+    records = load_history(getattr(args, "historico", HISTORY_FILE))
+    ids = runs(records)
+
+    if args.comando == "listar":
+        for run_id in ids:
+            stages = by_stage(records, run_id)
+            total = sum(r["tempo_s"] for r in stages.values())
+            print(f"{run_id}  {len(stages):3d} etapas  {total:10.2f}s")
+        return 0
+
+    if len(ids) < 2 and not (args.execucao and args.base):
+        print("Histórico insuficiente: são necessárias ao menos duas execuções")
+        return 2
+
+    current_id = args.execucao or ids[-1]
+    unknown = [run_id for run_id in (current_id, args.base) if run_id and run_id not in ids]
+    if unknown:
+        print(f"Execução não encontrada no histórico: {', '.join(unknown)}")
+        return 2
+    if args.base:
+        base_id = args.base
+    else:
+        position = ids.index(current_id)
+        if position == 0:
+            print(f"Não há execução anterior a {current_id}")
+            return 2
+        base_id = ids[position - 1]
+
+    result = compare(by_stage(records, current_id), by_stage(records, base_id), args.tolerancia, args.minimo_s)
+    print(f"Execução {current_id} vs base {base_id} (tolerância {args.tolerancia:.0%})")
+    for r in result:
+        flag = "REGRESSÃO" if r["regressao"] else ""
+        print(
+            f"{r['etapa']:<40} {r['metrica']:<14} {r['base']:>12} -> {r['atual']:>12} "
+            f"({r['variacao']:+.1%}) {flag}"
+        )
+
+    regressions = [r for r in result if r["regressao"]]
+    print(f"{len(regressions)} regressões encontradas")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
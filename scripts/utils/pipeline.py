@@ -0,0 +1,187 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+from scripts.config import logger, PROCESSED_DIR, PIPELINE_WORKERS
+
+STATE_FILE = PROCESSED_DIR / "pipeline_estado.json"
+
+
+@dataclass
+class Stage:
+    """
+    Etapa do pipeline. `inputs`/`outputs` são artefatos em disco: arquivos,
+    pastas (consideradas por inteiro) ou padrões glob (ex: raw/*.zip).
+    Uma etapa depende das que produzem algum dos seus `inputs` e das
+    listadas em `after`. Com `always`, roda sempre (ex: downloads, que
+    fazem a própria verificação de atualização).
+    """
+    name: str
+    run: Callable[[], object]
+    inputs: Sequence[Path] = ()
+    outputs: Sequence[Path] = ()
+    after: Sequence[str] = ()
+    always: bool = False
+    params: dict = field(default_factory=dict)
+
+
+def expand(artifact: Path) -> List[Path]:
+    """Arquivos que compõem um artefato, em ordem estável"""
+    if any(c in artifact.name for c in "*?["):
+        matches = sorted(artifact.parent.glob(artifact.name))
+    else:
+        matches = [artifact]
+
+    files = []
+    for path in matches:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.is_file()))
+        elif path.exists():
+            files.append(path)
+    return files
+
+
+def fingerprint(artifacts: Iterable[Path], params: Optional[dict] = None) -> str:
+    """
+    Impressão digital barata dos artefatos: caminho, tamanho e mtime de
+    cada arquivo (sem ler o conteúdo, que pode ter GBs), mais os parâmetros.
+    """
+    h = hashlib.sha256()
+    for artifact in artifacts:
+        h.update(str(artifact).encode("utf-8"))
+        for file in expand(artifact):
+            stat = file.stat()
+            h.update(f"{file}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    if params:
+        h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _produces(output: Path, artifact: Path) -> bool:
+    if output == artifact:
+        return True
+    if "*" in str(output) or "*" in str(artifact):
+        return False
+    return artifact.is_relative_to(output) or output.is_relative_to(artifact)
+
+
+class Pipeline:
+    """
+    Executa as etapas em ordem de dependência; etapas independentes rodam
+    ao mesmo tempo (threads: o trabalho pesado de cada etapa já usa seus
+    próprios processos). Uma etapa é pulada quando a impressão digital das
+    entradas é a mesma da última execução bem-sucedida e as saídas não
+    mudaram desde então (estado em pipeline_estado.json).
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        state_file: Path = STATE_FILE,
+        workers: int = PIPELINE_WORKERS
+    ):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Nomes de etapa duplicados no pipeline")
+        self.state_file = state_file
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        try:
+            self.state: Dict[str, dict] = json.loads(state_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.state = {}
+        self.dependencies = self._resolve_dependencies()
+
+    def _resolve_dependencies(self) -> Dict[str, Set[str]]:
+        deps: Dict[str, Set[str]] = {}
+        for stage in self.stages.values():
+            deps[stage.name] = set()
+            for name in stage.after:
+                if name not in self.stages:
+                    raise ValueError(f"Etapa {stage.name} depende de etapa inexistente: {name}")
+                deps[stage.name].add(name)
+            for other in self.stages.values():
+                if other is stage:
+                    continue
+                if any(_produces(o, i) for o in other.outputs for i in stage.inputs):
+                    deps[stage.name].add(other.name)
+
+        # ordenação topológica só para detectar ciclos
+        pending = {name: set(d) for name, d in deps.items()}
+        while pending:
+            ready = [name for name, d in pending.items() if not d]
+            if not ready:
+                raise ValueError(f"Dependência circular entre as etapas: {sorted(pending)}")
+            for name in ready:
+                del pending[name]
+            for d in pending.values():
+                d.difference_update(ready)
+        return deps
+
+    def _is_current(self, stage: Stage, inputs: str) -> bool:
+        if stage.always:
+            return False
+        previous = self.state.get(stage.name)
+        if not previous or previous.get("inputs") != inputs:
+            return False
+        if any(not expand(o) for o in stage.outputs):
+            return False
+        return previous.get("outputs") == fingerprint(stage.outputs)
+
+    def _execute(self, stage: Stage, force: bool) -> bool:
+        """Roda a etapa (ou a pula); retorna True se ela foi executada"""
+        inputs = fingerprint(stage.inputs, stage.params)
+        if not force and self._is_current(stage, inputs):
+            logger.info(f"[{stage.name}] entradas inalteradas, etapa ignorada")
+            return False
+
+        logger.info(f"[{stage.name}] iniciada")
+        stage.run()
+        with self._lock:
+            self.state[stage.name] = {"inputs": inputs, "outputs": fingerprint(stage.outputs)}
+            self._save()
+        logger.info(f"[{stage.name}] concluída")
+        return True
+
+    def _save(self):
+        tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2), encoding="utf-8")
+        tmp.replace(self.state_file)
+
+    def run(self, force: bool = False) -> Dict[str, bool]:
+        """
+        Executa o pipeline. Se uma etapa falha, as que dependem dela não são
+        iniciadas; as já em andamento terminam e o primeiro erro é relançado.
+        Retorna, por etapa, se ela foi executada (False = pulada).
+        """
+        done: Dict[str, bool] = {}
+        running = {}
+        failed: List[BaseException] = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                if not failed:
+                    for name, stage in self.stages.items():
+                        if name in done or name in running.values():
+                            continue
+                        if self.dependencies[name] <= done.keys():
+                            running[pool.submit(self._execute, stage, force)] = name
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        done[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"[{name}] falhou: {e}")
+                        failed.append(e)
+
+        if failed:
+            raise failed[0]
+        return done
@@ -0,0 +1,167 @@
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+from scripts.config import logger, RAW_DIR, PROCESSED_DIR
+from scripts.utils.pipeline import fingerprint
+from scripts.utils.schema import take_category, to_category
+
+CADASTRO_FILE = RAW_DIR / "operadoras_ativas.csv"
+REGISTRY_DIR = PROCESSED_DIR / "registro_operadoras"
+
+# colunas do cadastro mantidas no registro (nome no cadastro -> nome no registro)
+REGISTRY_COLUMNS = {
+    "CNPJ": "cnpj",
+    "Razao_Social": "razao_social",
+    "Modalidade": "modalidade",
+    "UF": "uf",
+}
+
+
+def _load(path: Path) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:  # array vazio não pode ser mapeado
+        return np.load(path)
+
+
+class KeyIndex:
+    """
+    Tabela ordenada por chave inteira com busca vetorizada: `positions`
+    resolve um array inteiro de chaves com um único searchsorted, e `take`
+    reúne as colunas por posição (sem merge). `take_category` faz o mesmo
+    devolvendo a coluna como dicionário (categórica).
+    """
+
+    def __init__(self, keys: np.ndarray, columns: Dict[str, np.ndarray]):
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+            if (keys[1:] == keys[:-1]).any():
+                raise ValueError("Chaves duplicadas no índice")
+        self.keys = keys
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def positions(self, keys) -> np.ndarray:
+        """Posição de cada chave no índice; -1 para chaves ausentes ou nulas"""
+        values = pd.array(keys, dtype="Int64")
+        missing = np.asarray(values.isna())
+        values = values.to_numpy(dtype=np.int64, na_value=-1)
+
+        pos = np.searchsorted(self.keys, values)
+        pos = np.minimum(pos, max(len(self.keys) - 1, 0))
+        found = ~missing & (len(self.keys) > 0)
+        if len(self.keys):
+            found &= self.keys[pos] == values
+        return np.where(found, pos, -1)
+
+    def take(self, name: str, positions: np.ndarray) -> np.ndarray:
+        """Valores de `name` nas posições dadas (object); None onde -1 ou vazio"""
+        values = self.columns[name]
+        if not len(values):
+            return np.full(len(positions), None, dtype=object)
+        result = values[np.maximum(positions, 0)].astype(object)
+        result[(positions < 0) | (result == "")] = None
+        return result
+
+    def dictionary(self, name: str) -> pd.Categorical:
+        """Coluna `name` codificada uma vez como dicionário ordenado (vazio = nulo)"""
+        cache = self.__dict__.setdefault("_dictionaries", {})
+        if name not in cache:
+            values = np.asarray(self.columns[name]).astype(object)
+            values[values == ""] = None
+            cache[name] = to_category(values)
+        return cache[name]
+
+    def take_category(self, name: str, positions: np.ndarray) -> pd.Categorical:
+        """Como `take`, mas só os códigos do dicionário são reunidos por linha"""
+        return take_category(self.dictionary(name), positions)
+
+    def lookup(self, keys, names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        pos = self.positions(keys)
+        names = list(names) if names is not None else list(self.columns)
+        return pd.DataFrame({name: self.take(name, pos) for name in names})
+
+
+class OperadoraRegistry(KeyIndex):
+    """
+    Registro compacto das operadoras, por número de registro ANS (inteiro),
+    com uma linha por operadora: entre registros repetidos no cadastro vale
+    o de menor CNPJ. Persistido em REGISTRY_DIR como um .npy por coluna
+    (lido via memory-map), e refeito só quando o cadastro muda.
+    """
+
+    @classmethod
+    def from_frame(cls, df_operadoras: pd.DataFrame) -> "OperadoraRegistry":
+        df = df_operadoras.copy()
+        cnpj = df["CNPJ"].astype("string").str.strip()
+        df["CNPJ"] = cnpj.mask(cnpj == "")
+        keys = pd.to_numeric(df["REGISTRO_OPERADORA"].astype("string").str.strip(), errors="coerce")
+
+        # mesma estratégia de desempate de antes: menor CNPJ primeiro (vazios por último)
+        df = (
+            df.assign(_registro=keys)
+            .dropna(subset=["_registro"])
+            .sort_values("CNPJ", kind="stable")
+            .drop_duplicates(subset="_registro", keep="first")
+        )
+
+        columns = {
+            name: df[source].astype("string").str.strip().fillna("").to_numpy(dtype=str)
+            for source, name in REGISTRY_COLUMNS.items()
+        }
+        return cls(df["_registro"].to_numpy(dtype=np.int64), columns)
+
+    @classmethod
+    def from_csv(cls, path: Path = CADASTRO_FILE) -> "OperadoraRegistry":
+        df = pd.read_csv(
+            path,
+            sep=";",
+            usecols=["REGISTRO_OPERADORA", *REGISTRY_COLUMNS],
+            dtype=str,
+            keep_default_na=False
+        )
+        return cls.from_frame(df)
+
+    def save(self, directory: Path = REGISTRY_DIR, source: Optional[str] = None):
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "registro.json").unlink(missing_ok=True)
+        np.save(directory / "registro.npy", self.keys)
+        for name, values in self.columns.items():
+            np.save(directory / f"{name}.npy", values)
+        meta = {"origem": source, "linhas": len(self), "colunas": list(self.columns)}
+        tmp = directory / "registro.json.tmp"
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        tmp.replace(directory / "registro.json")  # por último: marca o registro como completo
+
+    @classmethod
+    def load(cls, directory: Path = REGISTRY_DIR) -> "OperadoraRegistry":
+        meta = json.loads((directory / "registro.json").read_text(encoding="utf-8"))
+        registry = cls.__new__(cls)
+        registry.keys = _load(directory / "registro.npy")
+        registry.columns = {name: _load(directory / f"{name}.npy") for name in meta["colunas"]}
+        return registry
+
+    @classmethod
+    def open(cls, cadastro: Path = CADASTRO_FILE, directory: Path = REGISTRY_DIR) -> "OperadoraRegistry":
+        """Registro do cadastro atual: reaproveita o de REGISTRY_DIR ou o refaz se o cadastro mudou"""
+        source = fingerprint([cadastro])
+        try:
+            meta = json.loads((directory / "registro.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+
+        if meta.get("origem") == source:
+            return cls.load(directory)
+
+        logger.info(f"Construindo registro de operadoras a partir de {cadastro.name}")
+        registry = cls.from_csv(cadastro)
+        registry.save(directory, source)
+        logger.info(f"Registro de operadoras salvo em {directory} ({len(registry)} operadoras)")
+        return cls.load(directory)
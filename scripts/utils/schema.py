@@ -0,0 +1,115 @@
+import sys
+import numpy as np
+import pandas as pd
+from typing import Tuple
+from scripts.config import logger
+
+# Esquema compacto dos DataFrames do pipeline, aplicado por quem lê e por
+# quem grava os intermediários (scripts/utils/table_io.py):
+#   chaves inteiras no menor tipo que comporta o domínio (nulo permitido)
+INT_TYPES = {"RegistroANS": "Int32", "Ano": "Int16", "Trimestre": "Int16"}
+#   centavos continuam Int64 (somas passam de 2^31)
+MONEY_TYPE = "Int64"
+#   textos de baixa cardinalidade como dicionário (categorias em ordem lexical)
+CATEGORY_COLUMNS = {"CNPJ", "RAZAO_SOCIAL", "Modalidade", "UF", "MOTIVOS_INVALIDACAO"}
+
+MB = 1024 * 1024
+# tipos largos de referência: Int64 (8 bytes + máscara) e object (ponteiro + str por linha)
+_INT64_BYTES = 9
+_POINTER_BYTES = 8
+_NONE_BYTES = sys.getsizeof(None)
+
+
+def is_categorical(values) -> bool:
+    return isinstance(getattr(values, "dtype", None), pd.CategoricalDtype)
+
+
+def sorted_categories(values: pd.Series) -> pd.Series:
+    """Categórica com categorias em ordem lexical (groupby/sort saem como no texto)"""
+    categories = values.cat.categories
+    if categories.is_monotonic_increasing:
+        return values
+    return values.cat.reorder_categories(categories.sort_values())
+
+
+def to_category(values) -> pd.Categorical:
+    """Texto -> dicionário ordenado; nulos ficam como código -1"""
+    if is_categorical(values):
+        return sorted_categories(pd.Series(values)).array
+    return pd.Categorical(np.asarray(values, dtype=object))
+
+
+def take_category(dictionary: pd.Categorical, codes: np.ndarray) -> pd.Categorical:
+    """Linhas que apontam para `dictionary[codes]` (-1 = nulo), coletando só os códigos"""
+    codes = np.asarray(codes)
+    if not len(dictionary):
+        return pd.Categorical.from_codes(np.full(len(codes), -1), dtype=dictionary.dtype)
+    row_codes = np.where(codes >= 0, dictionary.codes[np.maximum(codes, 0)], -1)
+    return pd.Categorical.from_codes(row_codes, dtype=dictionary.dtype)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte as colunas conhecidas para os tipos compactos (altera e devolve `df`)"""
+    for c in df.columns:
+        if c in INT_TYPES:
+            if df[c].dtype != INT_TYPES[c]:
+                df[c] = pd.to_numeric(df[c], errors="coerce").astype(INT_TYPES[c])
+        elif c in CATEGORY_COLUMNS:
+            df[c] = to_category(df[c])
+    return df
+
+
+def memory_usage(df: pd.DataFrame) -> Tuple[int, int]:
+    """
+    Bytes de `df` com o esquema compacto e os estimados com os tipos
+    largos (Int64 nas chaves, um str por linha nos textos). A estimativa
+    sai dos dicionários (tamanho de cada categoria x ocorrências), sem
+    materializar a versão larga.
+    """
+    compact = wide = 0
+    for c in df.columns:
+        values = df[c]
+        used = int(values.memory_usage(index=False, deep=True))
+        compact += used
+        if is_categorical(values):
+            codes = values.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+            sizes = np.array([sys.getsizeof(v) for v in values.cat.categories], dtype=np.int64)
+            wide += len(values) * _POINTER_BYTES + int(counts @ sizes) + int((codes < 0).sum()) * _NONE_BYTES
+        elif c in INT_TYPES:
+            wide += len(values) * _INT64_BYTES
+        else:
+            wide += used
+    return compact, wide
+
+
+class MemoryReport:
+    """
+    Memória dos DataFrames de uma etapa com o esquema compacto e sem ele.
+    Em etapas por blocos vale o maior bloco (o que fica residente).
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.compact = 0
+        self.wide = 0
+
+    def add(self, df: pd.DataFrame):
+        compact, wide = memory_usage(df)
+        if wide > self.wide:
+            self.compact, self.wide = compact, wide
+
+    def log(self):
+        if not self.wide:
+            return
+        economia = 100 * (1 - self.compact / self.wide)
+        logger.info(
+            f"[esquema] {self.stage}: {self.compact / MB:.1f} MB em memória "
+            f"({self.wide / MB:.1f} MB sem o esquema compacto, -{economia:.0f}%)"
+        )
+
+
+def report_memory(stage: str, df: pd.DataFrame):
+    report = MemoryReport(stage)
+    report.add(df)
+    report.log()
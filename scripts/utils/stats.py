@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Sequence
+
+# Estatísticas parciais por grupo, combináveis (Chan et al.):
+#   n     quantidade de valores válidos
+#   soma  soma exata (inteiros, ex: centavos)
+#   media média dos valores do grupo
+#   m2    soma dos quadrados dos desvios em relação à média
+STATS_COLUMNS = ["n", "soma", "media", "m2"]
+
+
+def _empty(keys: Sequence[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        **{k: pd.Series(dtype=object) for k in keys},
+        "n": pd.Series(dtype=np.int64),
+        "soma": pd.Series(dtype=np.int64),
+        "media": pd.Series(dtype=float),
+        "m2": pd.Series(dtype=float),
+    })
+
+
+def partial_stats(df: pd.DataFrame, keys: Sequence[str], value: str) -> pd.DataFrame:
+    """
+    Estatísticas parciais de `value` por `keys`, vetorizadas sobre o bloco
+    inteiro: cada linha ganha o código do seu grupo e n, soma e m2 saem de
+    somas por código (bincount), sem laço por grupo. Nulos ficam de fora.
+    """
+    keys = list(keys)
+    if df.empty:
+        return _empty(keys)
+
+    # chaves categóricas: só as combinações presentes, na ordem das categorias
+    grouped = df.groupby(keys, sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    groups = grouped.size().index.to_frame(index=False)
+    size = len(groups)
+
+    values = pd.to_numeric(df[value], errors="coerce").astype("Int64")
+    valid = values.notna().to_numpy() & (codes >= 0)
+    codes = codes[valid]
+    x = values.to_numpy(dtype=np.int64, na_value=0)[valid]
+
+    n = np.bincount(codes, minlength=size).astype(np.int64)
+    soma = pd.Series(x).groupby(codes).sum().reindex(range(size), fill_value=0).to_numpy(dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = soma / n
+    # desvios em relação à média do próprio grupo (duas passadas vetorizadas, estável)
+    desvio = x - media[codes]
+    m2 = np.bincount(codes, weights=desvio * desvio, minlength=size)
+
+    return groups.assign(n=n, soma=soma, media=media, m2=m2)
+
+
+def combine_stats(partials: Iterable[pd.DataFrame], keys: Sequence[str]) -> pd.DataFrame:
+    """
+    Junta parciais de blocos ou trimestres diferentes. Para k parciais de
+    um grupo: n = Σnᵢ, soma = Σsomaᵢ, média = soma/n e
+    m2 = Σ(m2ᵢ + nᵢ·(médiaᵢ − média)²), a fórmula de Chan generalizada.
+    """
+    keys = list(keys)
+    partials: List[pd.DataFrame] = [p for p in partials if not p.empty]
+    if not partials:
+        return _empty(keys)
+    if len(partials) == 1:
+        return partials[0].reset_index(drop=True)
+
+    stacked = pd.concat(partials, ignore_index=True)
+    grouped = stacked.groupby(keys, sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    groups = grouped.size().index.to_frame(index=False)
+    size = len(groups)
+
+    n_i = stacked["n"].to_numpy(dtype=np.int64)
+    n = np.bincount(codes, weights=n_i, minlength=size).astype(np.int64)
+    soma = stacked["soma"].groupby(codes).sum().reindex(range(size), fill_value=0).to_numpy(dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = soma / n
+
+    # parciais sem valores (n = 0) mantêm o grupo, mas não pesam no m2
+    delta = np.where(n_i > 0, stacked["media"].to_numpy(dtype=float) - media[codes], 0.0)
+    m2_i = np.where(n_i > 0, stacked["m2"].to_numpy(dtype=float), 0.0)
+    m2 = np.bincount(codes, weights=m2_i + n_i * delta * delta, minlength=size)
+
+    return groups.assign(n=n, soma=soma, media=media, m2=m2)
+
+
+def finalize_stats(stats: pd.DataFrame, ddof: int = 1) -> pd.DataFrame:
+    """Acrescenta variância e desvio padrão (amostral com ddof=1, como o pandas)"""
+    n = stats["n"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variancia = np.where(n > ddof, stats["m2"].to_numpy(dtype=float) / (n - ddof), np.nan)
+    return stats.assign(
+        media=np.where(n > 0, stats["media"].to_numpy(dtype=float), np.nan),
+        variancia=variancia,
+        desvio=np.sqrt(np.maximum(variancia, 0)),
+    )
@@ -0,0 +1,285 @@
+import shutil
+import pandas as pd
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+from scripts.config import PROCESSED_DIR, INTERMEDIATE_FORMAT
+from scripts.utils.decimal_utils import cents_to_decimal, parse_decimal_cents
+from scripts.utils.schema import CATEGORY_COLUMNS, INT_TYPES, MONEY_TYPE, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (necessário só para parquet/arrow)
+    pa = None
+    pa_ipc = None
+    pq = None
+
+EXTENSIONS = {"csv": "csv", "parquet": "parquet", "arrow": "arrow"}
+SEP = ";"
+
+# Colunas monetárias: centavos Int64 em memória e nos formatos colunares,
+# decimal com 2 casas no CSV
+MONEY_COLUMNS = {"ValorDespesas"}
+# Chaves numéricas: mesmo tipo (compacto, ver schema.py) seja qual for o formato de origem
+INT_COLUMNS = set(INT_TYPES)
+
+
+def table_path(name: str, fmt: str = INTERMEDIATE_FORMAT, directory: Path = PROCESSED_DIR) -> Path:
+    """Caminho de um arquivo intermediário no formato configurado (INTERMEDIATE_FORMAT)"""
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Formato intermediário desconhecido: {fmt}")
+    if fmt != "csv" and pa is None:
+        raise RuntimeError(f"Formato {fmt} requer pyarrow instalado")
+    return directory / f"{name}.{EXTENSIONS[fmt]}"
+
+
+def partition_path(
+    name: str,
+    ano: int,
+    trimestre: int,
+    fmt: str = INTERMEDIATE_FORMAT,
+    directory: Path = PROCESSED_DIR
+) -> Path:
+    """Arquivo de uma partição `name/ano=YYYY/trimestre=N/` de um intermediário particionado"""
+    part = table_path("part", fmt, directory)
+    return directory / name / f"ano={ano}" / f"trimestre={trimestre}" / part.name
+
+
+def _partition_value(path: Path) -> int:
+    return int(path.name.split("=", 1)[1])
+
+
+def list_partitions(
+    name: str,
+    anos: Optional[Iterable[int]] = None,
+    trimestres: Optional[Iterable[int]] = None,
+    fmt: str = INTERMEDIATE_FORMAT,
+    directory: Path = PROCESSED_DIR
+) -> List[Path]:
+    """
+    Arquivos das partições de `name` em ordem (ano, trimestre). O filtro é
+    aplicado pelos nomes das pastas: partições fora de `anos`/`trimestres`
+    nem chegam a ser abertas.
+    """
+    anos = set(anos) if anos is not None else None
+    trimestres = set(trimestres) if trimestres is not None else None
+    file_name = partition_path(name, 0, 0, fmt, directory).name
+
+    files = []
+    for ano_dir in sorted((directory / name).glob("ano=*"), key=_partition_value):
+        if anos is not None and _partition_value(ano_dir) not in anos:
+            continue
+        for tri_dir in sorted(ano_dir.glob("trimestre=*"), key=_partition_value):
+            if trimestres is not None and _partition_value(tri_dir) not in trimestres:
+                continue
+            if (tri_dir / file_name).exists():
+                files.append(tri_dir / file_name)
+    return files
+
+
+def table_format(path: Path) -> str:
+    suffix = path.suffix.lstrip(".").lower()
+    return "csv" if suffix in ("csv", "txt") else suffix
+
+
+def _restore_types(df: pd.DataFrame) -> pd.DataFrame:
+    for c in df.columns:
+        if c in MONEY_COLUMNS:
+            if pd.api.types.is_numeric_dtype(df[c]):
+                df[c] = df[c].astype(MONEY_TYPE)
+            else:
+                df[c] = parse_decimal_cents(df[c])
+    return apply_schema(df)
+
+
+def _csv_dtypes(columns: Optional[Sequence[str]]) -> dict:
+    # chaves/valores como texto no CSV, convertidos por _restore_types;
+    # textos de baixa cardinalidade já lidos como dicionário
+    dtypes = {c: str for c in MONEY_COLUMNS | INT_COLUMNS}
+    dtypes.update({c: "category" for c in CATEGORY_COLUMNS})
+    return {c: t for c, t in dtypes.items() if columns is None or c in columns}
+
+
+def read_table(path: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Lê um intermediário (CSV, Parquet ou Arrow IPC) carregando só `columns`"""
+    fmt = table_format(path)
+    cols = list(columns) if columns is not None else None
+
+    if fmt == "csv":
+        df = pd.read_csv(path, sep=SEP, usecols=cols, dtype=_csv_dtypes(cols), low_memory=False)
+    elif fmt == "parquet":
+        df = pd.read_parquet(path, columns=cols)
+    elif fmt == "arrow":
+        with pa.memory_map(str(path)) as source:
+            table = pa_ipc.open_file(source).read_all()
+            df = (table.select(cols) if cols is not None else table).to_pandas()
+    else:
+        raise ValueError(f"Formato intermediário desconhecido: {path}")
+
+    return _restore_types(df)
+
+
+def iter_table(
+    path: Path,
+    columns: Optional[Sequence[str]] = None,
+    chunksize: int = 100_000
+) -> Iterator[pd.DataFrame]:
+    """Como read_table, mas entrega blocos de até `chunksize` linhas"""
+    fmt = table_format(path)
+    cols = list(columns) if columns is not None else None
+
+    if fmt == "csv":
+        chunks = pd.read_csv(
+            path, sep=SEP, usecols=cols, dtype=_csv_dtypes(cols), chunksize=chunksize
+        )
+        for chunk in chunks:
+            yield _restore_types(chunk)
+    elif fmt == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=cols):
+            yield _restore_types(batch.to_pandas())
+    elif fmt == "arrow":
+        with pa.memory_map(str(path)) as source:
+            reader = pa_ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if cols is not None:
+                    batch = batch.select(cols)
+                for start in range(0, batch.num_rows, chunksize):
+                    yield _restore_types(batch.slice(start, chunksize).to_pandas())
+    else:
+        raise ValueError(f"Formato intermediário desconhecido: {path}")
+
+
+def iter_dataset(
+    name: str,
+    columns: Optional[Sequence[str]] = None,
+    anos: Optional[Iterable[int]] = None,
+    trimestres: Optional[Iterable[int]] = None,
+    chunksize: int = 100_000
+) -> Iterator[pd.DataFrame]:
+    """Blocos de um intermediário particionado, lendo só as partições selecionadas"""
+    for path in list_partitions(name, anos, trimestres):
+        yield from iter_table(path, columns, chunksize)
+
+
+def read_dataset(
+    name: str,
+    columns: Optional[Sequence[str]] = None,
+    anos: Optional[Iterable[int]] = None,
+    trimestres: Optional[Iterable[int]] = None
+) -> pd.DataFrame:
+    """Como read_table, para um intermediário particionado por ano/trimestre"""
+    parts = [read_table(path, columns) for path in list_partitions(name, anos, trimestres)]
+    if not parts:
+        return _restore_types(pd.DataFrame(columns=list(columns) if columns is not None else []))
+    # dicionários diferentes entre partições viram texto no concat: recodifica
+    return apply_schema(pd.concat(parts, ignore_index=True))
+
+
+def _prepare_csv(df: pd.DataFrame) -> pd.DataFrame:
+    money = [c for c in df.columns if c in MONEY_COLUMNS]
+    if not money:
+        return df
+    return df.assign(**{c: cents_to_decimal(df[c]) for c in money})
+
+
+def _prepare_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    money = [c for c in df.columns if c in MONEY_COLUMNS]
+    # marcadores de texto (ex: "INVÁLIDO") viram nulo na coluna tipada
+    return apply_schema(df.assign(**{
+        c: pd.to_numeric(df[c], errors="coerce").round().astype(MONEY_TYPE) for c in money
+    }))
+
+
+def _columnar_schema(schema, fmt: str):
+    # dicionários com índice int32 (o dicionário cresce entre blocos); o Arrow
+    # IPC em arquivo não aceita dicionários diferentes entre lotes, então
+    # lá o texto é gravado sem dicionário e recodificado na leitura
+    text = pa.string() if fmt == "arrow" else pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [f.with_type(text) if pa.types.is_dictionary(f.type) else f for f in schema],
+        metadata=schema.metadata
+    )
+
+
+def csv_text(df: pd.DataFrame, header: bool = True) -> str:
+    """Bloco CSV no formato dos intermediários, como texto (para gravar em mais de um destino)"""
+    return _prepare_csv(df).to_csv(None, index=False, header=header, sep=SEP)
+
+
+class TableWriter:
+    """
+    Grava um intermediário em blocos. O arquivo só é criado no primeiro
+    `write`, então uma fonte sem linhas válidas não deixa arquivo vazio.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fmt = table_format(path)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame):
+        if self.fmt == "csv":
+            _prepare_csv(df).to_csv(
+                self.path,
+                mode="a" if self.rows else "w",
+                index=False,
+                header=not self.rows,
+                sep=SEP,
+                encoding="utf-8"
+            )
+        else:
+            table = pa.Table.from_pandas(_prepare_columnar(df), schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = _columnar_schema(table.schema, self.fmt)
+                table = table.cast(self._schema)
+                if self.fmt == "parquet":
+                    self._writer = pq.ParquetWriter(self.path, self._schema)
+                else:
+                    self._writer = pa_ipc.new_file(str(self.path), self._schema)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_table(df: pd.DataFrame, path: Path):
+    with TableWriter(path) as writer:
+        writer.write(df)
+
+
+def merge_tables(partials: List[Path], output: Path):
+    """Concatena intermediários parciais na ordem dada, removendo-os em seguida"""
+    partials = [p for p in partials if p.exists()]
+    if not partials:
+        return
+
+    if table_format(output) == "csv":
+        # cópia byte a byte, mantendo um único cabeçalho
+        with open(output, "wb") as out:
+            for i, partial in enumerate(partials):
+                with open(partial, "rb") as f:
+                    header = f.readline()
+                    if i == 0:
+                        out.write(header)
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+    else:
+        with TableWriter(output) as writer:
+            for partial in partials:
+                for chunk in iter_table(partial):
+                    writer.write(chunk)
+
+    for partial in partials:
+        partial.unlink()
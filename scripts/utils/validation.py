@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from scripts.utils.cnpj import check_cnpj
+from scripts.utils.schema import is_categorical, take_category, to_category
+
+INVALIDO = "INVÁLIDO"
+REASONS_COLUMN = "MOTIVOS_INVALIDACAO"
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """
+    Regra declarativa de validação de uma coluna.
+    `name`: código do motivo gravado em MOTIVOS_INVALIDACAO.
+    `check`: verificação em CHECKS (ex: "cnpj", "texto", "positivo").
+    `strip`: grava o texto sem espaços nas bordas (só "texto").
+    Valores inválidos de colunas de texto viram `marker`; colunas numéricas
+    mantêm o tipo e o valor inválido vira nulo (<NA>).
+    """
+    name: str
+    column: str
+    check: str
+    strip: bool = False
+    marker: str = INVALIDO
+
+
+# verificação -> função(coluna, regra) que devolve (válidos, valores normalizados)
+Check = Callable[[pd.Series, ColumnRule], Tuple[np.ndarray, pd.Series]]
+
+
+def _check_cnpj(values: pd.Series, rule: ColumnRule) -> Tuple[np.ndarray, pd.Series]:
+    valid, formatted = check_cnpj(values, rule.marker)
+    return valid, pd.Series(formatted, index=values.index)
+
+
+def _check_text(values: pd.Series, rule: ColumnRule) -> Tuple[np.ndarray, pd.Series]:
+    stripped = values.astype("string").str.strip()
+    valid = (stripped.notna() & (stripped != "")).to_numpy(dtype=bool)
+    kept = stripped.astype(object) if rule.strip else values.astype(object)
+    return valid, kept.where(valid, rule.marker)
+
+
+def _check_positive(values: pd.Series, rule: ColumnRule) -> Tuple[np.ndarray, pd.Series]:
+    numeric = pd.to_numeric(values, errors="coerce").astype("Int64")
+    valid = (numeric > 0).fillna(False).to_numpy(dtype=bool)
+    return valid, numeric.where(valid, pd.NA)
+
+
+CHECKS: Dict[str, Check] = {
+    "cnpj": _check_cnpj,
+    "texto": _check_text,
+    "positivo": _check_positive,
+}
+
+
+def _run_check(check: Check, values: pd.Series, rule: ColumnRule) -> Tuple[np.ndarray, pd.Series]:
+    if not is_categorical(values):
+        return check(values, rule)
+    # dicionário: a verificação roda uma vez por valor distinto (mais um
+    # para o nulo, no fim) e as linhas herdam o resultado pelo código
+    categories = values.cat.categories
+    domain = pd.Series(np.append(categories.to_numpy(dtype=object), None), dtype=object)
+    valid, normalized = check(domain, rule)
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, codes, len(categories))
+    return np.asarray(valid)[codes], pd.Series(
+        take_category(to_category(normalized), codes), index=values.index
+    )
+
+
+class Validator:
+    """
+    Avalia as regras coluna a coluna, cada uma como uma máscara sobre a
+    coluna inteira (colunas categóricas: uma vez por valor distinto).
+    Acumula em MOTIVOS_INVALIDACAO os códigos das regras que cada linha
+    violou (separados por vírgula; vazio se nenhuma), como dicionário, e
+    conta as rejeições por regra em `counts`, somando entre chamadas (blocos).
+    """
+
+    def __init__(self, rules: Sequence[ColumnRule]):
+        unknown = [rule.check for rule in rules if rule.check not in CHECKS]
+        if unknown:
+            raise ValueError(f"Verificação de validação desconhecida: {', '.join(unknown)}")
+        self.rules: List[ColumnRule] = list(rules)
+        self.counts: Dict[str, int] = {rule.name: 0 for rule in self.rules}
+
+    def apply(self, df: pd.DataFrame, reasons_column: Optional[str] = REASONS_COLUMN) -> pd.DataFrame:
+        """Novo DataFrame com os valores normalizados; `df` não é alterado"""
+        missing = [rule.column for rule in self.rules if rule.column not in df.columns]
+        if missing:
+            raise ValueError(f"Colunas ausentes para validação: {', '.join(missing)}")
+
+        columns: Dict[str, pd.Series] = {}
+        # bit i ligado = linha violou a regra i
+        violated = np.zeros(len(df), dtype=np.int64)
+        for i, rule in enumerate(self.rules):
+            valid, values = _run_check(CHECKS[rule.check], columns.get(rule.column, df[rule.column]), rule)
+            columns[rule.column] = values
+            invalid = ~valid
+            rejected = int(invalid.sum())
+            self.counts[rule.name] += rejected
+            if rejected:
+                violated[invalid] |= 1 << i
+
+        if reasons_column:
+            # um texto por combinação de regras violadas, não por linha
+            combinations, codes = np.unique(violated, return_inverse=True)
+            labels = [
+                ",".join(rule.name for i, rule in enumerate(self.rules) if bits >> i & 1)
+                for bits in combinations.tolist()
+            ]
+            columns[reasons_column] = pd.Series(
+                take_category(to_category(labels), codes.ravel()), index=df.index
+            )
+        # uma única cópia do frame, com todas as colunas substituídas de uma vez
+        return df.assign(**columns)
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# scripts.config exige BASE_URL e cria os diretórios de dados/logs ao ser importado
+_tmp = Path(tempfile.mkdtemp(prefix="pipeline-tests-"))
+os.environ.setdefault("BASE_URL", "http://127.0.0.1/")
+os.environ.setdefault("DATA_DIR", str(_tmp / "data"))
+os.environ.setdefault("LOG_DIR", str(_tmp / "logs"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
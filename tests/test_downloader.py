@@ -0,0 +1,170 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from scripts.etapa1.extract import downloader
+from scripts.etapa1.extract.downloader import download_file, part_meta_path, part_path, read_meta
+
+
+class FakeOrigin:
+    """Servidor local no papel da API da ANS: um ZIP falso com ETag, Range e If-Range"""
+
+    def __init__(self, content: bytes, etag: str = '"v1"'):
+        self.content = content
+        self.etag = etag
+        self.falhas = []  # status devolvidos (em ordem) antes de atender normalmente
+        self.pedidos = []  # (método, Range, If-Range) de cada requisição
+
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                origin.pedidos.append(("HEAD", None, None))
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(origin.content)))
+                self.send_header("ETag", origin.etag)
+                self.end_headers()
+
+            def do_GET(self):
+                rng, if_range = self.headers.get("Range"), self.headers.get("If-Range")
+                origin.pedidos.append(("GET", rng, if_range))
+                if origin.falhas:
+                    self.send_response(origin.falhas.pop(0))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                body, start = origin.content, 0
+                if rng and (if_range is None or if_range == origin.etag):
+                    start = int(rng.split("=")[1].split("-")[0])
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(body) - start))
+                self.send_header("ETag", origin.etag)
+                self.end_headers()
+                self.wfile.write(body[start:])
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/1T2025.zip"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def gets(self):
+        return [p for p in self.pedidos if p[0] == "GET"]
+
+
+@pytest.fixture
+def origin():
+    server = FakeOrigin(b"PK" + bytes(range(256)) * 40)
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(downloader, "DOWNLOAD_BACKOFF_S", 0)
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _part(dest, data: bytes, etag: str):
+    part_path(dest).write_bytes(data)
+    part_meta_path(dest).write_text(json.dumps({"etag": etag}), encoding="utf-8")
+
+
+def test_retoma_part_com_range_e_if_range(origin, tmp_path):
+    dest = tmp_path / "1T2025.zip"
+    _part(dest, origin.content[:1000], origin.etag)
+
+    download_file(origin.url, dest, retries=2)
+
+    assert dest.read_bytes() == origin.content
+    assert origin.gets() == [("GET", "bytes=1000-", origin.etag)]
+    assert read_meta(dest)["sha256"] == _sha(origin.content)
+    assert not part_path(dest).exists() and not part_meta_path(dest).exists()
+
+
+@pytest.mark.parametrize("head_sem_etag", [False, True])
+def test_arquivo_remoto_mudou_descarta_part(origin, tmp_path, monkeypatch, head_sem_etag):
+    dest = tmp_path / "1T2025.zip"
+    antigo = bytes(reversed(origin.content))  # mesmo tamanho, outro conteúdo
+    _part(dest, antigo[:1000], '"v0"')
+    if head_sem_etag:
+        # sem validador no HEAD, quem detecta a mudança é o If-Range
+        monkeypatch.setattr(downloader, "remote_head", lambda s, u: {"size": len(origin.content)})
+
+    download_file(origin.url, dest, retries=2)
+
+    assert dest.read_bytes() == origin.content
+    assert read_meta(dest)["sha256"] == _sha(origin.content)
+
+
+def test_part_sem_validador_nao_e_retomado(origin, tmp_path):
+    dest = tmp_path / "1T2025.zip"
+    part_path(dest).write_bytes(b"lixo" * 10)
+
+    download_file(origin.url, dest, retries=2)
+
+    assert dest.read_bytes() == origin.content
+    assert origin.gets() == [("GET", None, None)]
+
+
+def test_416_com_part_completo(origin, tmp_path):
+    dest = tmp_path / "1T2025.zip"
+    _part(dest, origin.content, origin.etag)
+
+    download_file(origin.url, dest, retries=2)
+
+    assert dest.read_bytes() == origin.content
+    assert read_meta(dest)["sha256"] == _sha(origin.content)
+
+
+def test_416_com_part_maior_reinicia(origin, tmp_path, monkeypatch):
+    dest = tmp_path / "1T2025.zip"
+    _part(dest, origin.content + b"sobra", origin.etag)
+    # HEAD sem tamanho: o excesso só aparece no 416
+    monkeypatch.setattr(downloader, "remote_head", lambda s, u: {"etag": origin.etag})
+
+    download_file(origin.url, dest, retries=3)
+
+    assert dest.read_bytes() == origin.content
+
+
+def test_5xx_e_429_sao_tentados_de_novo(origin, tmp_path):
+    dest = tmp_path / "1T2025.zip"
+    origin.falhas = [503, 429, 500]
+
+    download_file(origin.url, dest, retries=4)
+
+    assert dest.read_bytes() == origin.content
+    assert len(origin.gets()) == 4
+
+
+def test_5xx_esgota_tentativas(origin, tmp_path):
+    origin.falhas = [503] * 3
+    with pytest.raises(RuntimeError):
+        download_file(origin.url, tmp_path / "1T2025.zip", retries=3)
+
+
+def test_4xx_nao_e_tentado_de_novo(origin, tmp_path):
+    origin.falhas = [404]
+    with pytest.raises(requests.HTTPError):
+        download_file(origin.url, tmp_path / "1T2025.zip", retries=3)
+    assert len(origin.gets()) == 1
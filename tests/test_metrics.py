@@ -0,0 +1,41 @@
+import threading
+
+from scripts.utils import metrics
+
+
+def test_concurrent_measurements_are_flagged_and_skip_rss(tmp_path, monkeypatch):
+    history = tmp_path / "historico.jsonl"
+    record_run = metrics.record_run
+    monkeypatch.setattr(metrics, "record_run", lambda record: record_run(record, history))
+    resets = []
+    monkeypatch.setattr(metrics, "_reset_peak_rss", lambda: resets.append(1))
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def longa():
+        with metrics.Measurement("longa"):
+            started.set()
+            release.wait(5)
+
+    t = threading.Thread(target=longa)
+    t.start()
+    started.wait(5)
+    with metrics.Measurement("curta"):
+        pass
+    release.set()
+    t.join()
+    with metrics.Measurement("sozinha"):
+        pass
+
+    # só as medições que começam sem outra aberta zeram o pico
+    assert len(resets) == 2
+    records = {r["etapa"]: r for r in metrics.load_history(history)}
+    assert records["longa"]["concorrente"] and records["curta"]["concorrente"]
+    assert not records["sozinha"]["concorrente"]
+
+    base = {"curta": dict(records["curta"], pico_rss_mb=100.0, tempo_s=10.0)}
+    atual = {"curta": dict(records["curta"], pico_rss_mb=900.0, tempo_s=10.0)}
+    assert "pico_rss_mb" not in {r["metrica"] for r in metrics.compare(atual, base)}
+    atual["curta"]["concorrente"] = base["curta"]["concorrente"] = False
+    assert any(r["metrica"] == "pico_rss_mb" and r["regressao"] for r in metrics.compare(atual, base))
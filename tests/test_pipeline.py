@@ -0,0 +1,29 @@
+import importlib
+
+import scripts.etapa3.main
+from scripts.main import stages
+from scripts.utils.pipeline import Pipeline
+
+
+def _closure(deps, name):
+    # todas as etapas de que `name` depende, direta ou indiretamente
+    seen, pending = set(), list(deps[name])
+    while pending:
+        dep = pending.pop()
+        if dep not in seen:
+            seen.add(dep)
+            pending.extend(deps[dep])
+    return seen
+
+
+def test_grafo_completo_liga_importacao_as_etapas_1_e_2(tmp_path, monkeypatch):
+    # DATA_DIR relativo, como no .env.example
+    monkeypatch.setenv("DATA_DIR", "./data")
+    importlib.reload(scripts.etapa3.main)
+
+    deps = Pipeline(stages((1, 2, 3)), state_file=tmp_path / "estado.json").dependencies
+
+    # os CSVs importados são saídas das Etapas 1 e 2: a importação espera por elas
+    assert {"consolidacao", "download_operadoras", "enriquecimento_validacao_agregacao"} <= deps["importacao_banco"]
+    assert {"download_demonstracoes", "processamento", "consolidacao"} <= _closure(deps, "importacao_banco")
+    assert "importacao_banco" in deps["analises"]